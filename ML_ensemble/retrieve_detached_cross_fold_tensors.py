@@ -60,7 +60,6 @@ def run_inference_on_given_fold_data(config, cv_data_dir=None,
         for batch_idx, (padded_records, _, first_labels, labels_one_hot, record_names) in \
                 enumerate(tqdm(data_loader)):
             data, target = padded_records.to(device), labels_one_hot.to(device)
-            data = data.permute(0, 2, 1)  # switch seq_len and feature_size (12 = #leads)
             output = model(data)
             multi_lead_branch_active = False
             if type(output) is tuple:
@@ -39,7 +39,7 @@ class BaseDataLoader(DataLoader):
 
     def __init__(self, dataset, batch_size, shuffle, validation_split=None, num_workers=1, pin_memory=False,
                  cross_valid=False, train_idx=None, valid_idx=None, test_idx=None, cv_train_mode=True,
-                 fold_id=None, total_num_folds=None,
+                 fold_id=None, total_num_folds=None, persistent_workers=False, prefetch_factor=None,
                  collate_fn=default_collate, worker_init_fn=seed_worker, generator=torch.Generator()):
 
         generator.manual_seed(global_config.SEED)
@@ -125,9 +125,19 @@ class BaseDataLoader(DataLoader):
             'collate_fn': collate_fn,
             'num_workers': num_workers,
             'worker_init_fn': worker_init_fn,
-            'generator': generator
+            'generator': generator,
+            # Part of init_kwargs so that the validation loader built by split_validation() pins its
+            # batches as well (a prerequisite for overlapping the non-blocking H2D copies)
+            'pin_memory': pin_memory
         }
-        super().__init__(sampler=self.sampler, pin_memory=pin_memory, **self.init_kwargs)
+        if num_workers > 0:
+            # Keep the worker pool alive across epochs instead of re-spawning it on every iterator
+            # restart, and optionally queue more batches ahead per worker; both settings are only
+            # accepted by torch when worker processes are actually in use
+            self.init_kwargs['persistent_workers'] = persistent_workers
+            if prefetch_factor is not None:
+                self.init_kwargs['prefetch_factor'] = prefetch_factor
+        super().__init__(sampler=self.sampler, **self.init_kwargs)
 
     def _split_sampler(self, split):
         if self.single_run_valid_set_provided:
@@ -2,6 +2,35 @@ from base import BaseDataLoader
 from data_loader.ecg_data_set import ECGDataset
 import os
 
+import numpy as np
+import torch
+
+
+def ecg_batch_collate(batch):
+    """
+    Custom collate for the (signal, classes_encoded, first_class, classes_one_hot, record_name) samples
+    of ECGDataset. Compared to default_collate, the per-sample conversion work is amortized over the batch:
+    the signals and one-hot labels are each stacked with a single numpy/torch call instead of wrapping every
+    sample individually (which, for the memory-mapped cache, would also touch each read-only view separately).
+    """
+    signals = [sample[0] for sample in batch]
+    if isinstance(signals[0], torch.Tensor):
+        batched_signals = torch.stack(signals)
+    else:
+        # ndarray views, e.g. slices of the memory-mapped cache -> one batched copy, then one tensor wrap
+        batched_signals = torch.from_numpy(np.stack(signals))
+    # Hand the batch out channels-first ([batch_size, 12, seq_len]) as the models expect it; doing the
+    # transpose + copy here in the (parallel) loader workers replaces the per-batch permute on the device,
+    # which produced a non-contiguous tensor that conv1d had to copy into a contiguous buffer anyway
+    batched_signals = batched_signals.transpose(1, 2).contiguous()
+    # Ragged per-record label lists are carried through as-is; default_collate would choke on the varying
+    # lengths, which previously forced a str()/parse round-trip on every sample
+    classes_encoded = [sample[1] for sample in batch]
+    first_classes = torch.tensor([sample[2] for sample in batch])
+    labels_one_hot = torch.from_numpy(np.stack([np.asarray(sample[3]) for sample in batch]))
+    record_names = [sample[4] for sample in batch]
+    return batched_signals, classes_encoded, first_classes, labels_one_hot, record_names
+
 
 class ECGDataLoader(BaseDataLoader):
     """
@@ -10,7 +39,7 @@ class ECGDataLoader(BaseDataLoader):
 
     def __init__(self, data_dir, batch_size, shuffle=True, validation_split=0.0, num_workers=1, pin_memory=False,
                  cross_valid=False, train_idx=None, valid_idx=None, test_idx=None, cv_train_mode=True, fold_id=None,
-                 total_num_folds=None):
+                 total_num_folds=None, persistent_workers=False, prefetch_factor=None):
         # self.data_dir = data_dir
         if isinstance(validation_split, str):
             # If a dedicated validation split is given (PTB-XL), treat it separately
@@ -25,4 +54,5 @@ class ECGDataLoader(BaseDataLoader):
                          num_workers=num_workers, pin_memory=pin_memory,
                          cross_valid=cross_valid, train_idx=train_idx, valid_idx=valid_idx,
                          test_idx=test_idx, cv_train_mode=cv_train_mode, fold_id=fold_id,
-                         total_num_folds=total_num_folds)
+                         total_num_folds=total_num_folds, persistent_workers=persistent_workers,
+                         prefetch_factor=prefetch_factor, collate_fn=ecg_batch_collate)
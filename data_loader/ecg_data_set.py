@@ -1,14 +1,86 @@
 import os
 import pickle
 import pickle as pk
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import torch
 from torch.utils.data import Dataset
 
+from functools import lru_cache
+
 from utils import get_project_root, ensure_dir
 
+# Name of the optional consolidated signal cache directory (see preprocessing/build_record_cache.py)
+CACHE_DIR_NAME = "cache"
+
+
+@lru_cache(maxsize=None)
+def _read_sorted_record_names(file_name):
+    # Memoized, so repeated consistency checks (e.g. across CV folds) read each file only once
+    with open(file_name, "r") as file:
+        return sorted(line.rstrip() for line in file)
+
+
+def _load_meta(input_dir, record_name):
+    # Prefer the small meta sidecar written during preprocessing; it spares unpickling the full
+    # 72000-sample signal when only the label information is needed
+    meta_path = os.path.join(input_dir, os.path.splitext(record_name)[0] + ".meta")
+    if os.path.isfile(meta_path):
+        with open(meta_path, "rb") as file:
+            return pk.load(file)
+    with open(os.path.join(input_dir, record_name), "rb") as file:
+        _, meta = pk.load(file)
+    return meta
+
+
+def _build_label_csr(classes_encoded):
+    # CSR-style layout: record i owns indices[indptr[i]:indptr[i+1]], i.e. its encoded labels in original order
+    # (the first entry is the first/primary label). Memory is N * avg_labels_per_record instead of N * K.
+    indices = np.fromiter((label for labels in classes_encoded for label in labels), dtype=np.int16)
+    indptr = np.zeros(len(classes_encoded) + 1, dtype=np.int64)
+    np.cumsum([len(labels) for labels in classes_encoded], out=indptr[1:])
+    return indices, indptr
+
+
+@lru_cache(maxsize=4)
+def _gather_label_csr(input_dir, records):
+    """
+    Gathers the encoded labels of all given records into a ragged CSR structure (indices, indptr).
+    Module-level and memoized on purpose: several ECGDataset instances usually point to the same input
+    directory (train/valid/test setup, repeated CV folds), and without the cache each of them would redo
+    the identical full-dataset meta scan.
+    The scan dispatches the reads through a thread pool (the GIL is released during file IO,
+    so the disk reads overlap instead of blocking one after another).
+    The result is additionally persisted next to the records (label_indices.npy / label_indptr.npy), so later
+    runs memory-map the arrays straight from the page cache instead of re-scanning all metas.
+    :@param input_dir: Path to the directory containing the preprocessed pickle files for each record
+    :@param records: Tuple of record file names (tuple, so the arguments stay hashable for lru_cache)
+    :@return: Tuple of (indices, indptr) ndarrays
+    """
+    indices_path = os.path.join(input_dir, "label_indices.npy")
+    indptr_path = os.path.join(input_dir, "label_indptr.npy")
+    if os.path.isfile(indices_path) and os.path.isfile(indptr_path):
+        indices = np.load(indices_path, mmap_mode="r")
+        indptr = np.load(indptr_path, mmap_mode="r")
+        if len(indptr) == len(records) + 1:
+            return indices, indptr
+        # Stale file from an older preprocessing state -> fall through and rebuild it
+
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 2)) as executor:
+        classes_encoded = [meta["classes_encoded"]
+                           for meta in executor.map(lambda record: _load_meta(input_dir, record), records)]
+    indices, indptr = _build_label_csr(classes_encoded)
+    try:
+        np.save(indices_path, indices)
+        np.save(indptr_path, indptr)
+    except OSError:
+        # Data directory may be read-only (e.g. on a shared mount); keep the in-memory arrays then
+        pass
+    return indices, indptr
+
 
 def _save_record_names_to_txt(mode, record_names, suffix):
     project_root = get_project_root()
@@ -21,8 +93,11 @@ def _save_record_names_to_txt(mode, record_names, suffix):
 class ECGDataset(Dataset):
     """
     ECG dataset
-    Read the record names in __init__ but leaves the reading of actual data to __getitem__.
-    This is memory efficient because all the records are not stored in the memory at once but read as required.
+    If a consolidated cache exists (see preprocessing/build_record_cache.py), the whole dataset is
+    memory-mapped once in __init__ and __getitem__ reduces to a zero-copy slice into the mapped arrays.
+    Otherwise, only the record names are read in __init__ and the reading of the actual data is left to __getitem__.
+    The latter is memory efficient because all the records are not stored in the memory at once but read as required,
+    yet pays one pickle load (incl. DataFrame construction and float32 cast) per fetched sample.
     """
 
     def __init__(self, input_dir):
@@ -32,34 +107,135 @@ class ECGDataset(Dataset):
         :param transform: callable, optional -> Optional transform(s) to be applied on a sample.
         """
 
-        records = []
-        for file in sorted(os.listdir(input_dir)):
-            if ".pk" not in file:
-                continue
-            records.append(file)
+        # scandir avoids the extra stat per entry that listdir-based filtering would trigger
+        with os.scandir(input_dir) as entries:
+            file_names = [entry.name for entry in entries if entry.is_file()]
+        records = sorted(name for name in file_names if name.endswith(".pk"))
 
         self._input_dir = input_dir
         self.records = records
-        # Save list of classes occurring in the dataset
-        _, meta = pk.load(open(os.path.join(self._input_dir, records[0]), "rb"))
-        self.class_labels = meta["classes_one_hot"].index.values
+        # Precomputed absolute paths; os.path.join is surprisingly costly when called per __getitem__
+        self._record_paths = [os.path.join(input_dir, record) for record in records]
+        # Per-record float32 .npy signals written by newer preprocessing runs; if present, the pickle
+        # fallback in __getitem__ memory-maps them instead of unpickling the full DataFrame
+        npy_names = {name for name in file_names if name.endswith(".npy")}
+        self._signal_paths = [os.path.join(input_dir, os.path.splitext(record)[0] + ".npy")
+                              if os.path.splitext(record)[0] + ".npy" in npy_names else None
+                              for record in records]
+
+        cache_dir = os.path.join(input_dir, CACHE_DIR_NAME)
+        self._cache_active = os.path.isdir(cache_dir)
+        if self._cache_active:
+            # Memory-mapped views shared across all DataLoader workers via the OS page cache
+            self._signals = np.load(os.path.join(cache_dir, "signals.npy"), mmap_mode="r")
+            # A scales file indicates an int16-quantized cache that is dequantized on access in __getitem__
+            scales_path = os.path.join(cache_dir, "scales.npy")
+            self._scales = np.load(scales_path, mmap_mode="r") if os.path.isfile(scales_path) else None
+            self._classes_one_hot = np.load(os.path.join(cache_dir, "labels_onehot.npy"), mmap_mode="r")
+            self._first_class = np.load(os.path.join(cache_dir, "first_class.npy"), mmap_mode="r")
+            with open(os.path.join(cache_dir, "classes_encoded.pk"), "rb") as file:
+                cached_records, self._classes_encoded = pk.load(file)
+            assert cached_records == records, \
+                "The consolidated cache is outdated, rebuild it with preprocessing/build_record_cache.py!"
+            self.class_labels = np.arange(self._classes_one_hot.shape[1])
+        else:
+            # Save list of classes occurring in the dataset
+            class_labels_path = os.path.join(input_dir, "class_labels.npy")
+            if os.path.isfile(class_labels_path):
+                self.class_labels = np.load(class_labels_path)
+            else:
+                # Legacy datasets carry the labels as index of the classes_one_hot Series in each record's meta
+                meta = _load_meta(self._input_dir, records[0])
+                self.class_labels = meta["classes_one_hot"].index.values
+
+        # Frozenset for the per-sample label check in __getitem__ (O(1) lookups instead of scanning an ndarray)
+        self._label_set = frozenset(int(label) for label in self.class_labels)
+
+        # Ragged CSR label structure, built lazily on first use by _get_label_csr()
+        self._label_indices = None
+        self._label_indptr = None
+
+        # Dataset suffix used for naming the cached statistic files; identical for every helper call,
+        # so derive it once here instead of repeating the relpath/split dance in each method
+        if str(get_project_root()) in self._input_dir:
+            relative_path = os.path.relpath(self._input_dir, get_project_root())
+        else:
+            relative_path = self._input_dir
+        dataset = relative_path.split("/")[1]
+        self._dataset_suffix = f"{dataset}" if dataset == "CinC_CPSC" \
+            else f"{dataset}_{relative_path.split('/')[2].split('_')[0]}"
 
     def __len__(self):
         return len(self.records)
 
+    def _get_label_csr(self):
+        """
+        Provides the encoded labels of all records as a ragged CSR structure (indices, indptr), where record i
+        owns indices[indptr[i]:indptr[i+1]]. With an active cache it is derived once from the cached label lists;
+        otherwise it is gathered by the module-level _gather_label_csr (shared across dataset instances over the
+        same directory), so the helper methods harvesting labels for an idx_list no longer unpickle (and
+        immediately discard) the full 72000-sample signal for every single index.
+        :@return: Tuple of (indices, indptr) ndarrays
+        """
+        if self._label_indices is None:
+            if self._cache_active:
+                self._label_indices, self._label_indptr = _build_label_csr(self._classes_encoded)
+            else:
+                self._label_indices, self._label_indptr = _gather_label_csr(self._input_dir, tuple(self.records))
+        return self._label_indices, self._label_indptr
+
+    def get_record_names(self, idx_list):
+        """
+        Returns the record names for the given indices without touching the signals
+        Cheap batched alternative to calling __getitem__ (which decodes the full record) per index
+        just to read the name at tuple position 4
+        :@param idx_list: List resp. ndarray of indices into the dataset
+        :@return: List of record (file) names in the order of the given indices
+        """
+        return [self.records[idx] for idx in idx_list]
+
     def __getitem__(self, idx):
         if torch.is_tensor(idx):
             idx = idx.tolist()
 
         record_name = self.records[idx]
+
+        if self._cache_active:
+            # Zero-copy slice into the memory-mapped arrays -- no pickle, no DataFrame, no astype copy
+            if self._scales is None:
+                # Returned as ndarray view on purpose: the default collate performs the single unavoidable
+                # copy when stacking the batch, and a read-only mmap slice cannot back a torch tensor
+                signal = self._signals[idx]
+            else:
+                # int16-quantized cache: dequantize with the per-record scale (still only half the disk IO
+                # of a float32 cache since the multiplication happens after the bytes were moved)
+                # The dequantized array is freshly allocated, so the tensor wraps it without a further copy
+                signal = torch.from_numpy(self._signals[idx].astype(np.float32) * (self._scales[idx] / 32767))
+            return signal, \
+                self._classes_encoded[idx], int(self._first_class[idx]), \
+                self._classes_one_hot[idx], record_name
+
+        if self._signal_paths[idx] is not None:
+            # Newer preprocessing runs store the signal as float32 .npy next to the meta sidecar:
+            # memory-map it zero-copy and skip the DataFrame pickle entirely
+            meta = _load_meta(self._input_dir, record_name)
+            # Ensure that the record is not containing any unknown class label (skipped entirely under python -O)
+            assert self._label_set.issuperset(meta["classes_encoded"])
+            return np.load(self._signal_paths[idx], mmap_mode="r"), \
+                list(meta["classes_encoded"]), meta["classes_encoded"][0], \
+                np.asarray(meta["classes_one_hot"]), record_name
+
         # record is a df, meta a dict
-        record, meta = pk.load(open(os.path.join(self._input_dir, record_name), "rb"))
-        # Ensure that the record is not containing any unknown class label
-        assert all(label in self.class_labels for label in meta["classes_encoded"])
+        # The context manager closes the file descriptor deterministically instead of leaving it to the GC
+        with open(self._record_paths[idx], "rb") as file:
+            record, meta = pk.load(file)
+        # Ensure that the record is not containing any unknown class label (skipped entirely under python -O)
+        assert self._label_set.issuperset(meta["classes_encoded"])
 
-        return record.values.astype("float32"), \
-            str(meta["classes_encoded"]), meta["classes_encoded"][0], \
-            meta["classes_one_hot"].values, record_name
+        # Single cast copy straight into a tensor; astype followed by the collate conversion would copy twice
+        return torch.from_numpy(np.ascontiguousarray(record.values, dtype=np.float32)), \
+            list(meta["classes_encoded"]), meta["classes_encoded"][0], \
+            np.asarray(meta["classes_one_hot"]), record_name
 
     def get_ml_pos_weights(self, idx_list, mode=None, cross_valid_active=False):
         """
@@ -79,13 +255,7 @@ class ECGDataset(Dataset):
             # (not used for final eval)
             mode = "valid"
 
-        if str(get_project_root()) in self._input_dir:
-            relative_path = os.path.relpath(self._input_dir, get_project_root())
-        else:
-            relative_path = self._input_dir
-        dataset = relative_path.split("/")[1]
-        suffix = f"{dataset}" if dataset == "CinC_CPSC" \
-            else f"{dataset}_{relative_path.split('/')[2].split('_')[0]}"
+        suffix = self._dataset_suffix
 
         file_name = os.path.join(get_project_root(), f"data_loader/log/pos_weights_ml_{mode}_{suffix}.p")
 
@@ -101,27 +271,26 @@ class ECGDataset(Dataset):
         else:
             # File has not yet been created or cross validation is active
             # => Determine information from scratch and, in cases w/o cross validation, save to file
-            classes = []
-            record_names = []
-            for idx in idx_list:
-                _, _, _, classes_one_hot, record_name = self.__getitem__(idx)
-                classes.append(classes_one_hot)
-                record_names.append(record_name)
+            # Only the labels are needed here, so avoid loading the full records via __getitem__
+            indices, indptr = self._get_label_csr()
+            record_names = [self.records[idx] for idx in idx_list]
 
             if mode is not None and not cross_valid_active:
                 # Dump the record names to a txt file to ensure they are the same between VMs
                 _save_record_names_to_txt(mode, record_names, f"pos_weights_{suffix}")
 
-            # Get the class freqs as Pandas series
-            class_freqs = pd.DataFrame(classes).sum()
+            # Get the class freqs as ndarray: gather the ragged label slices and count with a single bincount
+            selected = np.concatenate([indices[indptr[idx]:indptr[idx + 1]] for idx in idx_list])
+            class_freqs = np.bincount(selected, minlength=len(self.class_labels)).astype(np.int64)
 
             # Calculate the number of pos and negative samples per class
+            # The DataFrame is only kept for the pickle-on-disk contract of the cached weight files
             df = pd.DataFrame({'num_pos_samples': class_freqs})
 
             # Each class should occur at least ones
             assert not df['num_pos_samples'].isin([0]).any(), "Each class should occur at least ones"
 
-            df['num_neg_samples'] = df.apply(lambda row: len(idx_list) - row.values).values
+            df['num_neg_samples'] = len(idx_list) - df['num_pos_samples'].to_numpy()
             df["ratio_neg_to_pos"] = df.num_neg_samples / (df.num_pos_samples)
             # If num_pos_samples can be 0, a dummy term needs to be added to it to avoid dividing by 0
             # df["ratio_neg_to_pos"] = df.num_neg_samples / (df.num_pos_samples + 1e-5)
@@ -165,13 +334,7 @@ class ECGDataset(Dataset):
             # (not used for final eval)
             mode = "valid"
 
-        if str(get_project_root()) in self._input_dir:
-            relative_path = os.path.relpath(self._input_dir, get_project_root())
-        else:
-            relative_path = self._input_dir
-        dataset = relative_path.split("/")[1]
-        suffix = f"{dataset}" if dataset == "CinC_CPSC" \
-            else f"{dataset}_{relative_path.split('/')[2].split('_')[0]}"
+        suffix = self._dataset_suffix
 
         print(f"Using suffix {suffix}")
 
@@ -188,39 +351,35 @@ class ECGDataset(Dataset):
             # If the file exists and the required indices match, just load the dataframe
             with open(file_name, "rb") as file:
                 df = pickle.load(file)
-            class_freqs = df['Class_freq']
-            inverse_class_freqs = df['Inverse_class_freq']
+            class_freqs = df['Class_freq'].values
+            inverse_class_freqs = df['Inverse_class_freq'].values
         else:
             # File has not yet been created or cross validation is active
             # => Determine information from scratch and, in cases w/o cross validation, save to file
-            classes = []
-            record_names = []
-            for idx in idx_list:
-                _, _, first_class_encoded, classes_one_hot, record_name = self.__getitem__(idx)
-                record_names.append(record_name)
-                if multi_label_training:
-                    classes.append(classes_one_hot)
-                else:
-                    # Only consider the first label
-                    classes_one_hot[:] = 0
-                    classes_one_hot[first_class_encoded] = 1
-                    classes.append(classes_one_hot)
+            # Only the labels are needed here, so avoid loading the full records via __getitem__
+            indices, indptr = self._get_label_csr()
+            record_names = [self.records[idx] for idx in idx_list]
 
             if mode is not None and not cross_valid_active:
                 # Dump the record names to a txt file to ensure they are the same between VMs
                 _save_record_names_to_txt(mode, record_names, f"class_freqs_{suffix}")
 
-            # Get the class freqs as Pandas series
-            class_freqs = pd.DataFrame(classes).sum()
+            # Get the class freqs as ndarray, counted with a single bincount over the gathered labels
+            if multi_label_training:
+                selected = np.concatenate([indices[indptr[idx]:indptr[idx + 1]] for idx in idx_list])
+            else:
+                # Only consider the first label, i.e. the first entry of each record's label slice
+                selected = indices[indptr[np.asarray(idx_list)]]
+            class_freqs = np.bincount(selected, minlength=len(self.class_labels)).astype(np.int64)
 
             # Each class should occur at least ones
-            assert not class_freqs.isin([0]).any(), "Each class should occur at least ones"
+            assert not (class_freqs == 0).any(), "Each class should occur at least ones"
 
             # Calculate the inverse class freqs
-            inverse_class_freqs = class_freqs.apply(lambda x: class_freqs.sum() / x)
+            inverse_class_freqs = class_freqs.sum() / class_freqs
 
-            df = pd.concat([class_freqs, inverse_class_freqs], axis=1)
-            df.columns = ['Class_freq', 'Inverse_class_freq']
+            # The DataFrame is only kept for the pickle-on-disk contract of the cached frequency files
+            df = pd.DataFrame({'Class_freq': class_freqs, 'Inverse_class_freq': inverse_class_freqs})
 
             if mode is not None and not cross_valid_active:
                 # Save the class_freqs to a pickle file called inverse_class_freq_<sl or ml>_{mode}.p,
@@ -229,24 +388,23 @@ class ECGDataset(Dataset):
                     pickle.dump(df, file)
 
         # Return them as as ndarray
-        return class_freqs.values if not inverse else inverse_class_freqs.values
+        return class_freqs if not inverse else inverse_class_freqs
 
     def _consistency_check_data_split(self, idx_list, mode, suffix):
-        with open(os.path.join(get_project_root(), f"data_loader/log/Record_names_{mode}_{suffix}.txt"), "r") as file:
-            records_for_mode = [line.rstrip() for line in file]
-            current_records = []
-            for idx in idx_list:
-                _, _, _, _, record_name = self.__getitem__(idx)
-                current_records.append(record_name)
+        # The record names are already known from __init__, so comparing them requires neither re-reading the
+        # pickles via __getitem__ nor re-parsing the Record_names file on every check
+        records_for_mode = _read_sorted_record_names(
+            os.path.join(get_project_root(), f"data_loader/log/Record_names_{mode}_{suffix}.txt"))
+        current_records = sorted(self.records[idx] for idx in idx_list)
 
         # with open(os.path.join(get_project_root(), f"data_loader/log/DEBUG_{mode}_{suffix}.txt"), "w") as txt_file:
         #     txt_file.write(f"Check called for {f'data_loader/log/Record_names_{mode}_{suffix}.txt'}" + "\n")
         #     txt_file.write("CURRENT RECORDS:" + "\n")
-        #     for line in sorted(current_records):
+        #     for line in current_records:
         #         txt_file.write("".join(line) + "\n")
         #     txt_file.write("\n" + "\n" + "\n" + "DESIRED RECORDS:" + "\n")
-        #     for line in sorted(records_for_mode):
+        #     for line in records_for_mode:
         #         txt_file.write("".join(line) + "\n")
 
-        assert sorted(current_records) == sorted(records_for_mode), "Data Split Error! Check this again!"
+        assert current_records == records_for_mode, "Data Split Error! Check this again!"
 
@@ -1,6 +1,9 @@
 import math
 
+import torch
 import torch.nn as nn
+import torch.nn.functional as F
+from torch.nn.utils.fusion import fuse_conv_bn_eval
 from torchinfo import summary
 from layers.LayerUtils import calc_same_padding_for_stride_one
 
@@ -50,9 +53,12 @@ class BasicBlock1dWithNorm(nn.Module):
         # If stride is 1 and the kernel_size uneven, an additional one-sided 0 is needed to keep/half dimension
         self._one_sided_padding = nn.ConstantPad1d((0, 1), 0)
 
+        # For odd kernels, the symmetric "same" padding of k//2 is handed to the convs below via their padding
+        # argument, so cuDNN applies it inside the convolution kernel instead of materializing a zero-filled
+        # copy of the activation first. Even kernels need asymmetric padding, which Conv1d cannot express,
+        # so only those keep the explicit pad modules in forward().
         half_mid_kernel = calc_same_padding_for_stride_one(dilation=1, kernel_size=mid_kernels_size)  # k//2
         half_mid_kernel_minus_1 = (mid_kernels_size - 1) // 2
-        self._half_mid_kernel_padding = nn.ConstantPad1d((half_mid_kernel, half_mid_kernel), 0)
         self._half_mid_kernel_padding_minus_1 = nn.ConstantPad1d((half_mid_kernel_minus_1, half_mid_kernel_minus_1), 0)
 
         half_last_kernel = calc_same_padding_for_stride_one(dilation=1, kernel_size=last_kernel_size)  # k//2
@@ -61,7 +67,12 @@ class BasicBlock1dWithNorm(nn.Module):
         self._half_last_kernel_padding_minus_1 = nn.ConstantPad1d((half_last_kernel_minus_1, half_last_kernel_minus_1),
                                                                   0)
 
-        self._conv1 = nn.Conv1d(in_channels=in_channels, out_channels=out_channels, kernel_size=mid_kernels_size)
+        mid_conv_padding = half_mid_kernel if mid_kernels_size % 2 else 0
+        # For an odd last kernel, (k-1)//2 == k//2, so the same conv padding is correct for stride 1 and 2
+        last_conv_padding = half_last_kernel if last_kernel_size % 2 else 0
+
+        self._conv1 = nn.Conv1d(in_channels=in_channels, out_channels=out_channels, kernel_size=mid_kernels_size,
+                                padding=mid_conv_padding)
         if self._norm_pos == "all":
             if self._norm_type == "BN":
                 self._norm1 = nn.BatchNorm1d(num_features=out_channels)
@@ -71,7 +82,8 @@ class BasicBlock1dWithNorm(nn.Module):
                 self._norm1 = nn.LayerNorm([self._out_channels, self._input_seq_len])
         self._lrelu1 = nn.LeakyReLU(0.3)
 
-        self._conv2 = nn.Conv1d(in_channels=out_channels, out_channels=out_channels, kernel_size=mid_kernels_size)
+        self._conv2 = nn.Conv1d(in_channels=out_channels, out_channels=out_channels, kernel_size=mid_kernels_size,
+                                padding=mid_conv_padding)
         if self._norm_pos == "all":
             if self._norm_type == "BN":
                 self._norm2 = nn.BatchNorm1d(num_features=out_channels)
@@ -82,7 +94,7 @@ class BasicBlock1dWithNorm(nn.Module):
         self._lrelu2 = nn.LeakyReLU(0.3)
 
         self._conv3 = nn.Conv1d(in_channels=out_channels, out_channels=out_channels, kernel_size=last_kernel_size,
-                                stride=stride)
+                                stride=stride, padding=last_conv_padding)
         # Before or after relu is handled during forward()
         if self._norm_pos == "all" or self._norm_pos == "last":
             if self._norm_type == "BN":
@@ -97,6 +109,7 @@ class BasicBlock1dWithNorm(nn.Module):
         # self._batch_norm = nn.BatchNorm1d(num_features=out_channels, momentum=0.01)
         # self._instance_norm = nn.InstanceNorm1d(num_features=out_channels, affine=True)
 
+        self._fused = False
         self._skips_active = skips_active
         self._downsample = None
         if self._skips_active:
@@ -173,16 +186,69 @@ class BasicBlock1dWithNorm(nn.Module):
             )
         return downsample
 
+    def fuse_for_inference(self):
+        """
+        Folds the BatchNorm layers of the block into their preceding convolutions (inference only)
+
+        In eval() mode, each BN applies a fixed per-channel affine transform, which can be absorbed
+        analytically into the weight and bias of the preceding conv (cf. torch.nn.utils.fusion).
+        Each folded BN saves one full read-write pass over the (N, C, T) activation plus a kernel
+        launch, which is the dominant cost for these memory-bound 1D convolutions.
+        Only valid for norm_type 'BN' and after eval() was called; calling it twice is a no-op.
+        """
+        assert self._norm_type == "BN", "Only BatchNorm can be folded into the preceding convolution"
+        assert not self.training, "Conv-BN fusion changes semantics in training mode; call eval() first"
+        if self._fused:
+            return self
+
+        if self._norm_pos == "all":
+            self._conv1 = fuse_conv_bn_eval(self._conv1, self._norm1)
+            self._norm1 = nn.Identity()
+            self._conv2 = fuse_conv_bn_eval(self._conv2, self._norm2)
+            self._norm2 = nn.Identity()
+        if self._norm_pos == "all" or self._norm_pos == "last":
+            self._conv3 = fuse_conv_bn_eval(self._conv3, self._norm3)
+            self._norm3 = nn.Identity()
+
+        if self._downsample is not None:
+            # The downsample path is a Sequential ending in a BN; fold it whenever a conv directly
+            # precedes it (for the pooled variants without channel alignment, the BN follows the
+            # pooling op and has to stay)
+            modules = list(self._downsample)
+            for idx in range(len(modules) - 1):
+                if isinstance(modules[idx], nn.Conv1d) and isinstance(modules[idx + 1], nn.BatchNorm1d):
+                    modules[idx] = fuse_conv_bn_eval(modules[idx], modules[idx + 1])
+                    modules[idx + 1] = nn.Identity()
+            self._downsample = nn.Sequential(*modules)
+
+        self._fused = True
+        return self
+
+    def to_torchscript_for_inference(self):
+        """
+        Returns a frozen, inference-optimized TorchScript version of the block for deployment
+
+        Builds on fuse_for_inference(): with the BNs folded away, the block tail is a plain
+        conv -> add -> activation sequence, which the frozen-graph optimizer can tighten further
+        (constant folding, dropout removal, conv/add reordering). TorchScript's dedicated
+        Conv-Add-ReLU fusion pass only matches nn.ReLU, not the LeakyReLU(0.3) these blocks were
+        trained with, so that particular collapse does not trigger -- swapping the activation just
+        to enable it would change the published architecture.
+        """
+        assert not self.training, "TorchScript inference optimization requires eval() mode"
+        if self._norm_type == "BN" and not self._fused:
+            self.fuse_for_inference()
+        return torch.jit.optimize_for_inference(torch.jit.freeze(torch.jit.script(self)))
+
     def forward(self, x):
         # Handle padding explicit
         residual = x
 
         # Conv1 -----------------------------------------------------------------
+        # Odd kernels pad inside the conv itself (see __init__); only even ones need explicit padding
         if self._mid_kernels_size % 2 == 0:
             x = self._one_sided_padding(x)
             x = self._half_mid_kernel_padding_minus_1(x)
-        else:
-            x = self._half_mid_kernel_padding(x)
         out = self._conv1(x)
         # Normalize here if "all"
         if self._norm_pos == "all":
@@ -194,8 +260,6 @@ class BasicBlock1dWithNorm(nn.Module):
         if self._mid_kernels_size % 2 == 0:
             out = self._one_sided_padding(out)
             out = self._half_mid_kernel_padding_minus_1(out)
-        else:
-            out = self._half_mid_kernel_padding(out)
         out = self._conv2(out)
         # Normalize here if "all"
         if self._norm_pos == "all":
@@ -204,18 +268,16 @@ class BasicBlock1dWithNorm(nn.Module):
         out = self._lrelu2(out)
 
         # Conv3 -----------------------------------------------------------------
-        # Conv3 has stride 2
-        if self._stride == 2:
-            if self._last_kernel_size % 2 == 0 and out.shape[2] % 2 != 0:
-                out = self._half_last_kernel_padding(out)
+        # Conv3 has stride 2; again, only even kernels still need the explicit (possibly asymmetric) padding
+        if self._last_kernel_size % 2 == 0:
+            if self._stride == 2:
+                if out.shape[2] % 2 != 0:
+                    out = self._half_last_kernel_padding(out)
+                else:
+                    out = self._half_last_kernel_padding_minus_1(out)
             else:
-                out = self._half_last_kernel_padding_minus_1(out)
-        else:
-            if self._last_kernel_size % 2 == 0:
                 out = self._one_sided_padding(out)
                 out = self._half_last_kernel_padding_minus_1(out)
-            else:
-                out = self._half_last_kernel_padding(out)
         out = self._conv3(out)
         # Normalize here if "all" or "last"
         if self._norm_pos == "all" or self._norm_pos == "last":
@@ -228,7 +290,7 @@ class BasicBlock1dWithNorm(nn.Module):
                 if self._poooled_downsample:
                     # Stride is two and kernel size is two as well
                     if residual.shape[2] % 2 != 0:
-                        residual = nn.ConstantPad1d((1, 1), 0)(residual)
+                        residual = F.pad(residual, (1, 1))
                 residual = self._downsample(residual)
             out += residual
 
@@ -242,5 +304,5 @@ class BasicBlock1dWithNorm(nn.Module):
 if __name__ == "__main__":
     model = BasicBlock1dWithNorm(in_channels=12, out_channels=12, mid_kernels_size=3, last_kernel_size=44, stride=2,
                                  down_sample='conv', drop_out=0.2, norm_type="BN", norm_pos="all",
-                                 input_dims=1125)
+                                 input_seq_len=1125)
     summary(model, input_size=(5, 12, 1125), col_names=["input_size", "output_size", "num_params"])
@@ -1,5 +1,5 @@
-import torch.cuda
 import torch.nn as nn
+import torch.nn.functional as F
 from torchinfo import summary
 from layers.LayerUtils import calc_same_padding_for_stride_one
 
@@ -41,9 +41,12 @@ class BasicBlock1dWithNormPreactivation(nn.Module):
         # If stride is 1 and the kernel_size uneven, an additional one-sided 0 is needed to keep/half dimension
         self._one_sided_padding = nn.ConstantPad1d((0, 1), 0)
 
+        # For odd kernels, the symmetric "same" padding of k//2 is handed to the convs below via their padding
+        # argument, so cuDNN applies it inside the convolution kernel instead of materializing a zero-filled
+        # copy of the activation first. Even kernels need asymmetric padding, which Conv1d cannot express,
+        # so only those keep the explicit pad modules in forward().
         half_mid_kernel = calc_same_padding_for_stride_one(dilation=1, kernel_size=mid_kernels_size)  # k//2
         half_mid_kernel_minus_1 = (mid_kernels_size - 1) // 2
-        self._half_mid_kernel_padding = nn.ConstantPad1d((half_mid_kernel, half_mid_kernel), 0)
         self._half_mid_kernel_padding_minus_1 = nn.ConstantPad1d((half_mid_kernel_minus_1, half_mid_kernel_minus_1), 0)
 
         half_last_kernel = calc_same_padding_for_stride_one(dilation=1, kernel_size=last_kernel_size)  # k//2
@@ -52,7 +55,12 @@ class BasicBlock1dWithNormPreactivation(nn.Module):
         self._half_last_kernel_padding_minus_1 = nn.ConstantPad1d((half_last_kernel_minus_1, half_last_kernel_minus_1),
                                                                   0)
 
-        self._conv1 = nn.Conv1d(in_channels=in_channels, out_channels=out_channels, kernel_size=mid_kernels_size)
+        mid_conv_padding = half_mid_kernel if mid_kernels_size % 2 else 0
+        # For an odd last kernel, (k-1)//2 == k//2, so the same conv padding is correct for stride 1 and 2
+        last_conv_padding = half_last_kernel if last_kernel_size % 2 else 0
+
+        self._conv1 = nn.Conv1d(in_channels=in_channels, out_channels=out_channels, kernel_size=mid_kernels_size,
+                                padding=mid_conv_padding)
         # If applied before or after the lrelu is handled in forward method
         if self._norm_pos == "all":
             if self._norm_type == "BN":
@@ -61,7 +69,8 @@ class BasicBlock1dWithNormPreactivation(nn.Module):
                 self._norm1 = nn.InstanceNorm1d(num_features=out_channels, affine=True)
         self._lrelu1 = nn.LeakyReLU(0.3)
 
-        self._conv2 = nn.Conv1d(in_channels=out_channels, out_channels=out_channels, kernel_size=mid_kernels_size)
+        self._conv2 = nn.Conv1d(in_channels=out_channels, out_channels=out_channels, kernel_size=mid_kernels_size,
+                                padding=mid_conv_padding)
         # If applied before or after the lrelu is handled in forward method
         if self._norm_pos == "all":
             if self._norm_type == "BN":
@@ -71,7 +80,7 @@ class BasicBlock1dWithNormPreactivation(nn.Module):
         self._lrelu2 = nn.LeakyReLU(0.3)
 
         self._conv3 = nn.Conv1d(in_channels=out_channels, out_channels=out_channels, kernel_size=last_kernel_size,
-                                stride=stride)
+                                stride=stride, padding=last_conv_padding)
         # If applied before or after the lrelu is handled in forward method
         if self._norm_pos == "all" or self._norm_pos == "last":
             if self._norm_type == "BN":
@@ -130,11 +139,10 @@ class BasicBlock1dWithNormPreactivation(nn.Module):
         x, residual = inputs
 
         # Conv1 -----------------------------------------------------------------
+        # Odd kernels pad inside the conv itself (see __init__); only even ones need explicit padding
         if self._mid_kernels_size % 2 == 0:
             x = self._one_sided_padding(x)
             x = self._half_mid_kernel_padding_minus_1(x)
-        else:
-            x = self._half_mid_kernel_padding(x)
         out = self._conv1(x)
         # Normalize here if "all" and norm_before_act is True
         if self._norm_pos == "all" and self._norm_before_act:
@@ -150,8 +158,6 @@ class BasicBlock1dWithNormPreactivation(nn.Module):
         if self._mid_kernels_size % 2 == 0:
             out = self._one_sided_padding(out)
             out = self._half_mid_kernel_padding_minus_1(out)
-        else:
-            out = self._half_mid_kernel_padding(out)
         out = self._conv2(out)
         # Normalize here if "all" and norm_before_act is True
         if self._norm_pos == "all" and self._norm_before_act:
@@ -163,18 +169,16 @@ class BasicBlock1dWithNormPreactivation(nn.Module):
             out = self._norm2(out)
 
         # Conv3 -----------------------------------------------------------------
-        # Conv3 has stride 2
-        if self._stride == 2:
-            if self._last_kernel_size % 2 == 0 and out.shape[2] % 2 != 0:
-                out = self._half_last_kernel_padding(out)
+        # Conv3 has stride 2; again, only even kernels still need the explicit (possibly asymmetric) padding
+        if self._last_kernel_size % 2 == 0:
+            if self._stride == 2:
+                if out.shape[2] % 2 != 0:
+                    out = self._half_last_kernel_padding(out)
+                else:
+                    out = self._half_last_kernel_padding_minus_1(out)
             else:
-                out = self._half_last_kernel_padding_minus_1(out)
-        else:
-            if self._last_kernel_size % 2 == 0:
                 out = self._one_sided_padding(out)
                 out = self._half_last_kernel_padding_minus_1(out)
-            else:
-                out = self._half_last_kernel_padding(out)
         out = self._conv3(out)
 
         # Residual -----------------------------------------------------------------
@@ -184,7 +188,7 @@ class BasicBlock1dWithNormPreactivation(nn.Module):
             if self._poooled_downsample:
                 # Stride is two and kernel size is two as well
                 if residual.shape[2] % 2 != 0:
-                    residual = nn.ConstantPad1d((1, 1), 0)(residual)
+                    residual = F.pad(residual, (1, 1))
             residual = self._downsample(residual)
 
         out += residual
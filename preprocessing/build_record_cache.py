@@ -0,0 +1,152 @@
+import os
+import pickle as pk
+
+import numpy as np
+
+CACHE_DIR_NAME = "cache"
+
+
+def build_cache(input_dir, cache_dir=None, quantize=False):
+    """
+    Consolidates the preprocessed per-record pickle files under the given path into memory-mapped .npy arrays.
+
+    Each pickle contains a (df, meta) tuple with the signal as 72000xleads DataFrame; loading them one-by-one in
+    ECGDataset.__getitem__ pays syscall + pickle + DataFrame construction cost per sample. Since all records share
+    the same shape and dtype after the float32 cast, they fit into one flat tensor of shape (N, seq_len, leads):
+    - signals.npy         float32 (or int16 if quantize=True), shape (N, seq_len, leads), written via open_memmap
+    - scales.npy          float32, shape (N,) -- per-record dequantization scale, only written if quantize=True
+    - labels_onehot.npy   uint8,   shape (N, num_classes)
+    - first_class.npy     int16,   shape (N,)
+    - classes_encoded.pk  (record_names, classes_encoded) -- ragged label lists, kept as a small pickle
+    ECGDataset then np.loads the arrays with mmap_mode='r', so __getitem__ reduces to a pointer-arithmetic slice
+    and all DataLoader workers share the pages through the OS page cache instead of private unpickled copies.
+
+    With quantize=True, each record is scaled to int16 via q = round(sig / max(|sig|) * 32767), which halves the
+    bytes moved per fetch; ECGDataset dequantizes on access with the stored per-record scale. ECG amplitudes fit
+    comfortably into the 15-bit mantissa, so the rounding error is well below the measurement noise.
+
+    The actual pickle files are kept unchanged, i.e., ECGDataset can still fall back to them if no cache exists.
+    @param input_dir: Path to the directory containing the preprocessed pickle files for each record
+    @param cache_dir: Target directory for the cache files; defaults to <input_dir>/cache
+    @param quantize: If True, signals are stored as int16 with a per-record scale instead of float32
+    @return: Path of the written cache directory
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(input_dir, CACHE_DIR_NAME)
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+
+    records = sorted(file for file in os.listdir(input_dir) if file.endswith(".pk"))
+    assert len(records) > 0, "No preprocessed .pk records found under " + str(input_dir)
+
+    signals = None
+    labels_onehot = None
+    first_class = np.empty(len(records), dtype=np.int16)
+    scales = np.empty(len(records), dtype=np.float32) if quantize else None
+    classes_encoded = []
+    for idx, record_name in enumerate(records):
+        with open(os.path.join(input_dir, record_name), "rb") as file:
+            df, meta = pk.load(file)
+        if signals is None:
+            # Allocate the memory-mapped target once the record shape is known; filling it row by row keeps
+            # the peak memory footprint at a single record rather than the whole dataset
+            seq_len, num_leads = df.shape
+            signals = np.lib.format.open_memmap(os.path.join(cache_dir, "signals.npy"), mode="w+",
+                                                dtype=np.int16 if quantize else np.float32,
+                                                shape=(len(records), seq_len, num_leads))
+            labels_onehot = np.empty((len(records), len(meta["classes_one_hot"])), dtype=np.uint8)
+        else:
+            assert df.shape == signals.shape[1:], \
+                f"Record {record_name} has shape {df.shape}, expected {signals.shape[1:]}"
+        if quantize:
+            scale = np.abs(df.values).max()
+            scale = scale if scale > 0 else 1.0
+            signals[idx] = np.round(df.values / scale * 32767).astype(np.int16)
+            scales[idx] = scale
+        else:
+            signals[idx] = df.values
+        labels_onehot[idx] = np.asarray(meta["classes_one_hot"])
+        classes_encoded.append([int(label) for label in meta["classes_encoded"]])
+        first_class[idx] = classes_encoded[-1][0]
+    signals.flush()
+
+    if quantize:
+        np.save(os.path.join(cache_dir, "scales.npy"), scales)
+    np.save(os.path.join(cache_dir, "labels_onehot.npy"), labels_onehot)
+    np.save(os.path.join(cache_dir, "first_class.npy"), first_class)
+    with open(os.path.join(cache_dir, "classes_encoded.pk"), "wb") as file:
+        pk.dump((records, classes_encoded), file)
+
+    print(f"Wrote consolidated memory-mapped cache for {len(records)} records to {cache_dir}")
+    return cache_dir
+
+
+def export_parquet(input_dir, parquet_path=None, batch_size=256):
+    """
+    Exports the preprocessed per-record pickle files under the given path into a single compressed Parquet file.
+
+    In contrast to the memory-mapped cache of build_cache, which is optimized for random access during training,
+    the Parquet export is meant for archival and interchange: LZ4-compressed float32 leads shrink the on-disk
+    footprint considerably compared to the float64 pickle DataFrames, and since each lead and each meta field is
+    a separate column, readers can prune down to what they actually need, e.g.
+        pq.read_table(path, columns=["classes_one_hot", "classes_encoded"])
+    fetches the label information without touching a single signal page.
+    @param input_dir: Path to the directory containing the preprocessed pickle files for each record
+    @param parquet_path: Target path for the Parquet file; defaults to <input_dir>/records.parquet
+    @param batch_size: Number of records per row group (bounds the memory footprint while writing)
+    @return: Path of the written Parquet file
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if parquet_path is None:
+        parquet_path = os.path.join(input_dir, "records.parquet")
+
+    records = sorted(file for file in os.listdir(input_dir) if file.endswith(".pk"))
+    assert len(records) > 0, "No preprocessed .pk records found under " + str(input_dir)
+
+    writer = None
+    for start in range(0, len(records), batch_size):
+        batch_records = records[start:start + batch_size]
+        leads = None
+        classes_one_hot = []
+        classes_encoded = []
+        for record_name in batch_records:
+            with open(os.path.join(input_dir, record_name), "rb") as file:
+                df, meta = pk.load(file)
+            if leads is None:
+                seq_len = df.shape[0]
+                leads = [[] for _ in range(df.shape[1])]
+            for lead_idx, column in enumerate(df.columns):
+                leads[lead_idx].append(df[column].values.astype(np.float32))
+            classes_one_hot.append(np.asarray(meta["classes_one_hot"], dtype=np.uint8).tolist())
+            classes_encoded.append([int(label) for label in meta["classes_encoded"]])
+
+        columns = {
+            f"lead_{lead_idx}": pa.FixedSizeListArray.from_arrays(
+                pa.array(np.concatenate(lead), type=pa.float32()), seq_len)
+            for lead_idx, lead in enumerate(leads)
+        }
+        columns["classes_one_hot"] = pa.array(classes_one_hot, type=pa.list_(pa.uint8()))
+        columns["classes_encoded"] = pa.array(classes_encoded, type=pa.list_(pa.int16()))
+        columns["record_name"] = pa.array(batch_records)
+        table = pa.table(columns)
+
+        if writer is None:
+            writer = pq.ParquetWriter(parquet_path, table.schema, compression="lz4", use_dictionary=False)
+        writer.write_table(table)
+    writer.close()
+
+    print(f"Wrote Parquet export for {len(records)} records to {parquet_path}")
+    return parquet_path
+
+
+if __name__ == "__main__":
+    for src_path in ["../data/CinC_CPSC/train/preprocessed/250Hz/60s",
+                     "../data/CinC_CPSC/test/preprocessed/250Hz/60s",
+                     "../data/CinC_CPSC/cross_valid/250Hz/60s"]:
+        build_cache(src_path)
+        # Uncomment for additionally exporting a compressed, column-prunable Parquet copy
+        # export_parquet(src_path)
+
+    print("Finished")
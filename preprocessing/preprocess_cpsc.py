@@ -64,7 +64,9 @@ def _parse_and_downsample_record(src_path, file, target_path, sampling, orig_Hz=
         df = df.resample(sampling).mean()
         df.index = np.arange(0, df.shape[0])  # return to numbers as row index (0-#samples)
 
-    pk.dump((df, meta), open(f"{target_path}/{file}.pk", "wb"))
+    # Protocol 5 serializes the underlying signal buffer out-of-band, i.e. without byte-by-byte copies
+    with open(f"{target_path}/{file}.pk", "wb") as pk_file:
+        pk.dump((df, meta), pk_file, protocol=5)
 
 
 def _read_records(src_path, target_path, sampling):  # 4ms = 250Hz
@@ -171,7 +173,8 @@ def clean_meta(path):
                     dx = new_dx
                     # Save the changed order also to the meta information of the pickle object!
                     meta["dx"] = ','.join(dx)  # convert list to comma separated string
-                    pk.dump((df, meta), open(str(p), "wb"))
+                    with open(str(p), "wb") as pk_file:
+                        pk.dump((df, meta), pk_file, protocol=5)
 
             for d in dx:
                 # Appends a row in the new dataframe with the record path as row index
@@ -189,18 +192,24 @@ def clean_meta(path):
         to_csv('info/own_encoding_CinC.csv', index=False)
     metas.columns = list(range(len(metas.columns)))
 
+    # The class labels themselves are written once per directory instead of being carried in every record's
+    # meta dict (formerly as index of the classes_one_hot Series)
+    np.save(os.path.join(path, "class_labels.npy"), metas.columns.to_numpy(dtype=np.int16))
+
     # Iterate through the records (one row in metas per record) and update its meta information
     for p, classes in metas.iterrows():
         df, meta = pk.load(open(str(p), "rb"))
         # Appends to additional entries to the dict
-        # The first is a Series containing a 1 if the class applies to the record and a 0 otherwise
+        # The first is a uint8 ndarray containing a 1 if the class applies to the record and a 0 otherwise
+        # (8x smaller than the former float64 Series and directly usable for vectorized aggregation)
         # The second is list of integers encoding the classes that apply to the record
-        meta["classes_one_hot"] = classes.replace(np.nan, 0)
+        meta["classes_one_hot"] = classes.replace(np.nan, 0).to_numpy(dtype=np.uint8)
         meta["classes_encoded"] = [own_wfdb_encoding.inverse[label] for label in meta["dx"].split(",")]
         # The following potentially changes the order but can be used for integrity check
         assert set(meta["classes_encoded"]) == set(classes.dropna().keys().to_list()), \
             "Integrity check failed - check meta data cleaning during preprocessing"
-        pk.dump((df, meta), open(str(p), "wb"))
+        with open(str(p), "wb") as pk_file:
+            pk.dump((df, meta), pk_file, protocol=5)
 
     print("Finished meta data cleaning for " + src_path)
 
@@ -218,6 +227,10 @@ def pad_or_truncate(path, seq_len, seconds=None, pad_halfs=False):
     if not os.path.exists(os.path.join(path, folder_name)):
         os.makedirs(os.path.join(path, folder_name))
 
+    # The class labels written by clean_meta belong to the records and hence move along with them
+    if os.path.isfile(os.path.join(path, "class_labels.npy")):
+        shutil.copy(os.path.join(path, "class_labels.npy"), os.path.join(path, folder_name))
+
     for file in os.listdir(path):
         if ".pk" not in file:
             continue
@@ -253,7 +266,16 @@ def pad_or_truncate(path, seq_len, seconds=None, pad_halfs=False):
         # plot_record_from_df(record_name=str(file), df_record=df_record, preprocesed=True)
 
         # Dump updated, ready-to-use df to new pk file
-        pk.dump((df_record, meta), open(os.path.join(path, folder_name, file), "wb"))
+        # Protocol 5 serializes the underlying signal buffer out-of-band, i.e. without byte-by-byte copies
+        with open(os.path.join(path, folder_name, file), "wb") as pk_file:
+            pk.dump((df_record, meta), pk_file, protocol=5)
+        # Additionally dump the meta dict into a small sidecar file, so consumers that only need the label
+        # information (e.g. the frequency helpers of ECGDataset) do not have to unpickle the full signal
+        with open(os.path.join(path, folder_name, os.path.splitext(file)[0] + ".meta"), "wb") as meta_file:
+            pk.dump(meta, meta_file, protocol=5)
+        # ... and the signal as ready-to-use float32 .npy, which ECGDataset can memory-map zero-copy
+        np.save(os.path.join(path, folder_name, os.path.splitext(file)[0] + ".npy"),
+                df_record.values.astype(np.float32))
 
 
 def show(path):
@@ -294,7 +294,7 @@ def finalize_preprocessing(dest_path, X, y, file_names):
     """
         This method appends the required information for each record
         To this end, two additional entries are added to a meta dictionary of the record
-        1) meta["classes_one_hot"]: Pandas Series containing a 1 if the class applies to the record and a 0 otherwise
+        1) meta["classes_one_hot"]: uint8 ndarray containing a 1 if the class applies to the record and a 0 otherwise
         2) meta["classes_encoded"]: List of integers encoding the classes that apply to the record
                             (the integers are in the range between 0 and N-1, with N being the number of classes
                             existing amongst the record under the given path)
@@ -309,15 +309,26 @@ def finalize_preprocessing(dest_path, X, y, file_names):
     if not os.path.exists(dest_path):
         os.makedirs(dest_path)
 
+    # The class labels themselves are written once per directory instead of being carried in every record's meta
+    np.save(os.path.join(dest_path, "class_labels.npy"), np.arange(y.shape[1], dtype=np.int16))
+
     for idx, file in enumerate(file_names):
         # Retrieve ECG data
         df_data = pd.DataFrame(X[idx])
 
-        # Create required meta data
-        meta = {'classes_one_hot': pd.Series(y[idx]), 'classes_encoded': np.flatnonzero(y[idx] == 1).tolist()}
+        # Create required meta data (uint8 one-hot, 8x smaller than a float64 Series)
+        meta = {'classes_one_hot': y[idx].astype(np.uint8), 'classes_encoded': np.flatnonzero(y[idx] == 1).tolist()}
 
         # Dump the results to pickle
-        pickle.dump((df_data, meta), open(f"{dest_path}/{file}.pk", "wb"))
+        # Protocol 5 serializes the underlying signal buffer out-of-band, i.e. without byte-by-byte copies
+        with open(f"{dest_path}/{file}.pk", "wb") as pk_file:
+            pickle.dump((df_data, meta), pk_file, protocol=5)
+        # Additionally dump the meta dict into a small sidecar file, so consumers that only need the label
+        # information (e.g. the frequency helpers of ECGDataset) do not have to unpickle the full signal
+        with open(f"{dest_path}/{file}.meta", "wb") as meta_file:
+            pickle.dump(meta, meta_file, protocol=5)
+        # ... and the signal as ready-to-use float32 .npy, which ECGDataset can memory-map zero-copy
+        np.save(f"{dest_path}/{file}.npy", df_data.values.astype(np.float32))
 
     print("Finished data finalizing for " + dest_path)
 
@@ -194,7 +194,6 @@ def test_model(config, tune_config=None, cv_active=False, cv_data_dir=None,
                 data, target, target_all_labels = padded_records.to(device), first_labels.to(device), \
                     labels_one_hot.to(device)
 
-            data = data.permute(0, 2, 1)  # switch seq_len and feature_size (12 = #leads)
             output = model(data)
 
             multi_lead_branch_active = False
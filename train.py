@@ -1,6 +1,7 @@
 import argparse
 import collections
 from datetime import datetime
+import importlib
 import pickle
 import random
 from pathlib import Path
@@ -29,17 +30,85 @@ os.environ["CUDA_VISIBLE_DEVICES"] = global_config.CUDA_VISIBLE_DEVICES
 TUNE_TEMP_DIR = global_config.TUNE_TEMP_DIR
 
 
-def _set_seed(SEED):
+def _apply_determinism(deterministic):
+    os.environ["CUBLAS_WORKSPACE_CONFIG"] = ":16:8"
+    if deterministic:
+        # Note: If sparse or entmax are not used at the end, warn only can be set to false again!
+        torch.use_deterministic_algorithms(True, warn_only=True)
+        torch.backends.cudnn.deterministic = True
+        torch.backends.cudnn.benchmark = False
+    else:
+        # The ECG models run fixed-shape 1D convs, so cuDNN's autotuner pays off right after the first
+        # step; determinism costs a good part of conv throughput since cuDNN is then restricted to its
+        # deterministic (slower) algorithms
+        torch.use_deterministic_algorithms(False)
+        torch.backends.cudnn.deterministic = False
+        torch.backends.cudnn.benchmark = True
+
+
+def _set_seed(SEED, deterministic=True):
     np.random.seed(SEED)
     torch.manual_seed(SEED)
     random.seed(SEED)
     torch.cuda.manual_seed_all(SEED)
-    os.environ["CUDA_LAUNCH_BLOCKING"] = "1"
-    os.environ["CUBLAS_WORKSPACE_CONFIG"] = ":16:8"
-    # Note: If sparse or entmax are not used at the end, warn only can be set to false again!
-    torch.use_deterministic_algorithms(True, warn_only=True)
-    torch.backends.cudnn.deterministic = True
-    torch.backends.cudnn.benchmark = False
+    # CUDA_LAUNCH_BLOCKING serializes every kernel launch with the host and thereby kills the CPU-GPU
+    # overlap of PyTorch's async dispatch -- it is a debugging aid, not needed for reproducibility
+    if os.environ.get("DEBUG_CUDA_SYNC"):
+        os.environ["CUDA_LAUNCH_BLOCKING"] = "1"
+    _apply_determinism(deterministic)
+
+
+class _CudaPrefetchLoader:
+    """
+    Wraps a DataLoader and copies the next batch to the GPU on a dedicated side stream while the
+    current batch is still being trained on, so the host-to-device transfer overlaps with compute
+    instead of being serialized behind the previous step. Requires pin_memory=True on the wrapped
+    loader for the non_blocking copies to actually be asynchronous. Non-tensor batch elements
+    (record names, encoded label lists) are passed through untouched; attribute access (dataset,
+    sampler, batch_size, ...) is delegated to the wrapped loader so the trainer does not notice
+    the difference. The trainer's own .to(device) calls become no-ops on the already-moved tensors.
+    """
+
+    def __init__(self, dataloader, device):
+        self._dataloader = dataloader
+        self._device = device
+        self._stream = torch.cuda.Stream(device)
+
+    def __getattr__(self, name):
+        return getattr(self._dataloader, name)
+
+    def __len__(self):
+        return len(self._dataloader)
+
+    def _to_device(self, batch):
+        return tuple(part.to(self._device, non_blocking=True) if isinstance(part, torch.Tensor) else part
+                     for part in batch)
+
+    def __iter__(self):
+        iterator = iter(self._dataloader)
+        try:
+            upcoming = next(iterator)
+        except StopIteration:
+            return
+        with torch.cuda.stream(self._stream):
+            upcoming = self._to_device(upcoming)
+        while upcoming is not None:
+            # The copy of the batch to be yielded was issued on the side stream; order it before any
+            # work the consumer enqueues, and keep the allocator from recycling the device memory
+            # while the compute stream still uses it
+            torch.cuda.current_stream(self._device).wait_stream(self._stream)
+            batch = upcoming
+            for part in batch:
+                if isinstance(part, torch.Tensor):
+                    part.record_stream(torch.cuda.current_stream(self._device))
+            try:
+                upcoming = next(iterator)
+            except StopIteration:
+                upcoming = None
+            if upcoming is not None:
+                with torch.cuda.stream(self._stream):
+                    upcoming = self._to_device(upcoming)
+            yield batch
 
 
 def _get_mid_kernel_size_second_conv_blocks(spec):
@@ -47,60 +116,137 @@ def _get_mid_kernel_size_second_conv_blocks(spec):
     return spec.config.mid_kernel_size_first_conv_blocks
 
 
+# The parameters for the tuning can be specified here according to the example scheme below.
+# One builder per arch; the lambdas defer the tune.grid_search calls until actually requested
+_TUNING_BUILDERS = {
+    "BaselineModelWithMHAttention": lambda: {
+        "dropout_attention": tune.grid_search([0.2, 0.3]),
+        "heads": tune.grid_search([6]),
+        "gru_units": tune.grid_search([12])
+        # "dropout_attention": tune.grid_search([0.2, 0.3]),
+        # "heads": tune.grid_search([6, 8, 12]),
+        # "gru_units": tune.grid_search([12, 24, 36])
+    },
+    "FinalModel": lambda: {
+        "dropout_attention": tune.grid_search([0.2, 0.3, 0.4]),
+        "heads": tune.grid_search([6, 8, 12])
+        # "gru_units": tune.grid_search([12, 24]),
+    },
+    "FinalModelMultiBranch": lambda: {
+        # BranchNet specifics
+        "branchNet_reduce_channels": tune.grid_search([True, False]),
+        "branchNet_heads": tune.grid_search([6, 8]),
+        "branchNet_attention_dropout": tune.grid_search([0.2, 0.4]),
+        # Multibranch specifics
+        "multi_branch_heads": tune.grid_search([12, 24]),
+        "multi_branch_attention_dropout": tune.grid_search([0.2, 0.4]),
+        "use_conv_reduction_block": True,
+        "conv_reduction_first_kernel_size": tune.grid_search([3, 8, 16]),
+        "conv_reduction_second_kernel_size": tune.grid_search([3, 8, 16]),
+        "conv_reduction_third_kernel_size": tune.grid_search([3, 8, 16]),
+    },
+}
+
+
 def tuning_params(name):
-    # The parameters for the tuning can be specified here according to the example scheme below
-    if name == "BaselineModelWithMHAttention":
-        return {
-            "dropout_attention": tune.grid_search([0.2, 0.3]),
-            "heads": tune.grid_search([6]),
-            "gru_units": tune.grid_search([12])
-            # "dropout_attention": tune.grid_search([0.2, 0.3]),
-            # "heads": tune.grid_search([6, 8, 12]),
-            # "gru_units": tune.grid_search([12, 24, 36])
-        }
-    elif name == "FinalModel":
-        return {
-            "dropout_attention": tune.grid_search([0.2, 0.3, 0.4]),
-            "heads": tune.grid_search([6, 8, 12])
-            #"gru_units": tune.grid_search([12, 24]),
-        }
-    elif name == "FinalModelMultiBranch":
-        return {
-            # BranchNet specifics
-            "branchNet_reduce_channels": tune.grid_search([True, False]),
-            "branchNet_heads": tune.grid_search([6, 8]),
-            "branchNet_attention_dropout": tune.grid_search([0.2, 0.4]),
-            # Multibranch specifics
-            "multi_branch_heads": tune.grid_search([12, 24]),
-            "multi_branch_attention_dropout": tune.grid_search([0.2, 0.4]),
-            "use_conv_reduction_block": True,
-            "conv_reduction_first_kernel_size": tune.grid_search([3, 8, 16]),
-            "conv_reduction_second_kernel_size": tune.grid_search([3, 8, 16]),
-            "conv_reduction_third_kernel_size": tune.grid_search([3, 8, 16]),
-        }
-    else:
-        return None
+    builder = _TUNING_BUILDERS.get(name)
+    return builder() if builder is not None else None
+
+
+# Console columns for the tune progress table: the metrics are the same for every arch, only the
+# displayed hyperparameters differ
+_TUNE_METRIC_COLUMNS = ["loss", "val_loss",
+                        "val_macro_sk_f1",
+                        "val_weighted_sk_f1",
+                        "training_iteration"]
+
+_REPORTER_PARAM_COLUMNS = {
+    "BaselineModelWithMHAttention": {
+        "dropout_attention": "Droput MH Attention",
+        "heads": "Num Heads",
+        "gru_units": "Num Units GRU"
+    },
+    "FinalModel": {
+        # MACRO
+        "dropout_attention": "Droput MH Attention",
+        "heads": "H",
+        "gru_units": "GRU"
+    },
+    "FinalModelMultiBranch": {
+        "branchNet_reduce_channels": "BN_Rdc",
+        "branchNet_heads": "BN_H",
+        "branchNet_attention_dropout": "BN_DP",
+        # Multibranch specifics
+        "multi_branch_heads": "MB_H",
+        "multi_branch_attention_dropout": "MB_DP",
+        "use_conv_reduction_block": "MB_ConvRed",
+        "conv_reduction_first_kernel_size": "ConvRed_1st",
+        "conv_reduction_second_kernel_size": "ConvRed_2nd",
+        "conv_reduction_third_kernel_size": "ConvRed_3rd"
+    },
+}
+
+# GPU fraction per trial, i.e. the inverse of how many trials fit on one card
+_NUM_GPU_BY_ARCH = {
+    "BaselineModelWithMHAttention": 0.16,  # Six trials in parallel
+    "FinalModel": 0.2,  # Five trials in parallel
+    "FinalModelMultiBranch": 0.5,  # Two trials in parallel
+    # One trial at a time
+    "BaselineModelWithSkipConnectionsV2": 1,
+    "BaselineModelWithSkipConnectionsAndNormV2": 1,
+    "BaselineModelWithSkipConnectionsAndNormPreActivation": 1,
+}
+
+
+# Registry of the supported architectures; resolved via importlib in train_model, which replaces
+# the former elif-ladder of conditional imports (one dict lookup instead of repeated string compares,
+# relevant since train_fn runs this once per tune trial)
+_ARCH_MODULES = {
+    "BaselineModel": "model.baseline_model",
+    "BaselineModelWithMHAttention": "model.baseline_model_with_MHAttention",
+    "BaselineModelWithSkipConnectionsAndNormPreActivation":
+        "model.baseline_model_with_skips_and_norm_pre_activation_design",
+    "FinalModel": "model.final_model",
+    "FinalModelMultiBranch": "model.final_model_multibranch",
+}
+
+_METRIC_MODULES = {
+    True: "evaluation.multi_label_metrics",
+    False: "evaluation.single_label_metrics",
+}
+
+
+def _tune_worker_init():
+    # Runs once per (reusable) Ray worker process via worker_process_setup_hook. The expensive part
+    # is torch.use_deterministic_algorithms inside _set_seed, which walks all registered ops to
+    # install its checks -- there is no need to repeat that for every short trial a worker executes;
+    # the per-trial train_fn only re-seeds the RNGs
+    global_config.suppress_warnings()
+    _set_seed(global_config.SEED)
+
+
+def _config_key(config):
+    # Canonical, insertion-order independent dedup key; str(dict) re-formats the whole config on
+    # every lookup and differs for equal configs with different key order
+    return hash(tuple(sorted((key, str(value)) for key, value in config.items())))
 
 
 class MyTuneCallback(Callback):
 
     def __init__(self):
-        self.already_seen = set()
-        self.manager = TuneClient(tune_address="127.0.0.1", port_forward=4321)
-
-    def setup(self):
-        # Load the already seen configurations to avoid that the experiments are repeated here
+        # Pre-populate with already seen configurations to avoid that the experiments are repeated
         # Useful, if training was interrupted and the same experiment should be continued
         seen_configs = []
-        for config in seen_configs:
-            self.already_seen.add(str(config))
+        self.already_seen = {_config_key(config) for config in seen_configs}
+        self.manager = TuneClient(tune_address="127.0.0.1", port_forward=4321)
 
     def on_trial_start(self, iteration, trials, trial, **info):
-        if str(trial.config) in self.already_seen:
+        key = _config_key(trial.config)
+        if key in self.already_seen:
             print("Stop trial with id " + str(trial.trial_id))
             self.manager.stop_trial(trial.trial_id)
         else:
-            self.already_seen.add(str(trial.config))
+            self.already_seen.add(key)
 
 
 def hyper_study(main_config, tune_config, num_tune_samples=1):
@@ -121,58 +267,71 @@ def hyper_study(main_config, tune_config, num_tune_samples=1):
         validation_split = os.path.join(str(get_project_root()), validation_split)
 
     def train_fn(config, checkpoint_dir=None):
-        global_config.suppress_warnings()
-
-        # Without this, the valid split varies from worker to worker!
+        # The one-time setup (warning filters, env vars, deterministic algorithms) already ran in
+        # _tune_worker_init when the worker process came up. Re-seeding the RNGs per trial stays:
+        # without this, the valid split varies from worker to worker!
         np.random.seed(global_config.SEED)
         torch.manual_seed(global_config.SEED)
         random.seed(global_config.SEED)
         torch.cuda.manual_seed_all(global_config.SEED)
-        os.environ["CUDA_LAUNCH_BLOCKING"] = "1"
-        os.environ["CUBLAS_WORKSPACE_CONFIG"] = ":16:8"
-        # Since entmax is used, warn only needs to be set to True
-        torch.use_deterministic_algorithms(True, warn_only=True)
-        # Each of the following two aspects would lead to a TypeError !
-        # torch.backends.cudnn.deterministic = True
-        # torch.backends.cudnn.benchmark = False
+        if not main_config['trainer'].get('deterministic', True):
+            # Fixed-shape 1D convs: let cuDNN's autotuner pick the fastest algorithms
+            _apply_determinism(False)
 
         data_loader = main_config.init_obj('data_loader', module_data_loader,
-                                           data_dir=full_data_dir, validation_split=validation_split)
+                                           data_dir=full_data_dir, validation_split=validation_split,
+                                           num_workers=per_trial_workers,
+                                           persistent_workers=True, prefetch_factor=4,
+                                           pin_memory=torch.cuda.is_available())
         valid_data_loader = data_loader.split_validation()
 
         print(f"Len Dataloader {len(data_loader.dataset)}")
         print(f"Len Validloader {len(valid_data_loader.dataset)}")
 
-        # Check data splitting by record name -> should be equal across all workers and tune runs
-        valid_records = []
-        for idx in valid_data_loader.sampler.indices:
-            valid_records.append(valid_data_loader.dataset[idx][4])
-        valid_records.sort()
-
-        project_root = get_project_root()
-        ensure_dir(os.path.join(project_root, 'data_loader', 'tune_log'))
-
-        dataset = data_dir.split("/")[1]
-        print(f"Tune run on dataset {dataset}")
-        suffix = f"{dataset}" if dataset == "CinC_CPSC" \
-            else f"{dataset}_{data_dir.split('/')[2].split('_')[0]}"
-
-        if Path(os.path.join(project_root, 'data_loader', 'tune_log', f'valid_records_tune_train_fn_{suffix}.txt')).is_file():
-            # If the file already exists, check if the records are the same
-            with open(os.path.join(project_root, 'data_loader', 'tune_log', f'valid_records_tune_train_fn_{suffix}.txt'),
-                      "r") as txt_file:
-                lines = txt_file.read().splitlines()
-                assert valid_records == lines, "Data Split Error! Check this again!"
-        else:
-            with open(os.path.join(project_root, 'data_loader', 'tune_log', f'valid_records_tune_train_fn_{suffix}.txt'),
-                      "w+") as txt_file:
-                for line in valid_records:
-                    txt_file.write("".join(line) + "\n")
+        # Check data splitting by record name -> should be equal across all workers and tune runs.
+        # Pure debugging telemetry, so it only runs when DUMP_VALID_SPLIT is set; the record names
+        # are taken straight from the dataset's records list instead of materializing every
+        # validation sample through __getitem__ just to read its name
+        if os.environ.get("DUMP_VALID_SPLIT"):
+            valid_records = sorted(valid_data_loader.dataset.get_record_names(valid_data_loader.sampler.indices))
+
+            project_root = get_project_root()
+            ensure_dir(os.path.join(project_root, 'data_loader', 'tune_log'))
+
+            dataset = data_dir.split("/")[1]
+            print(f"Tune run on dataset {dataset}")
+            suffix = f"{dataset}" if dataset == "CinC_CPSC" \
+                else f"{dataset}_{data_dir.split('/')[2].split('_')[0]}"
+
+            if Path(os.path.join(project_root, 'data_loader', 'tune_log',
+                                 f'valid_records_tune_train_fn_{suffix}.txt')).is_file():
+                # If the file already exists, check if the records are the same
+                with open(os.path.join(project_root, 'data_loader', 'tune_log',
+                                       f'valid_records_tune_train_fn_{suffix}.txt'), "r") as txt_file:
+                    lines = txt_file.read().splitlines()
+                    assert valid_records == lines, "Data Split Error! Check this again!"
+            else:
+                with open(os.path.join(project_root, 'data_loader', 'tune_log',
+                                       f'valid_records_tune_train_fn_{suffix}.txt'), "w+") as txt_file:
+                    # One bulk write instead of one libc call per record name
+                    txt_file.write("\n".join(valid_records) + "\n")
+
+        if torch.cuda.is_available():
+            # Overlap the host-to-device copy of the next batch with the current training step
+            cuda_device = torch.device('cuda')
+            data_loader = _CudaPrefetchLoader(data_loader, cuda_device)
+            valid_data_loader = _CudaPrefetchLoader(valid_data_loader, cuda_device)
 
         train_model(config=main_config, tune_config=config, train_dl=data_loader, valid_dl=valid_data_loader,
                     checkpoint_dir=checkpoint_dir, use_tune=True)
 
-    ray.init(_temp_dir=os.path.join(TUNE_TEMP_DIR, 'ray_tmp'))
+    if os.environ.get("RAY_ADDRESS"):
+        # Attach to an existing Ray cluster so the grid spreads across all its nodes; the placement
+        # group bundles below let Tune schedule each trial on whichever node has capacity
+        ray.init(address="auto", runtime_env={"worker_process_setup_hook": _tune_worker_init})
+    else:
+        ray.init(_temp_dir=os.path.join(TUNE_TEMP_DIR, 'ray_tmp'),
+                 runtime_env={"worker_process_setup_hook": _tune_worker_init})
 
     trainer = main_config['trainer']
     early_stop = trainer.get('monitor', 'off')
@@ -182,68 +341,32 @@ def hyper_study(main_config, tune_config, num_tune_samples=1):
         mnt_mode = "min"
         mnt_metric = "val_loss"
 
-    # The reporter is used to print the results of the tuning to the console
-    # It can be configured here according to the example scheme below
-    if main_config["arch"]["type"] == "BaselineModelWithMHAttention":
-        reporter = CLIReporter(
-            parameter_columns={
-                "dropout_attention": "Droput MH Attention",
-                "heads": "Num Heads",
-                "gru_units": "Num Units GRU"
-            },
-            metric_columns=["loss", "val_loss",
-                            "val_macro_sk_f1",
-                            "val_weighted_sk_f1",
-                            "training_iteration"])
-    elif main_config["arch"]["type"] == "FinalModel":
-        reporter = CLIReporter(
-            # MACRO
-            parameter_columns={
-                "dropout_attention": "Droput MH Attention",
-                "heads": "H",
-                "gru_units": "GRU"
-            },
-            metric_columns=["loss", "val_loss",
-                            "val_macro_sk_f1",
-                            "val_weighted_sk_f1",
-                            "training_iteration"])
-    elif main_config["arch"]["type"] == "FinalModelMultiBranch":
-        reporter = CLIReporter(
-            parameter_columns={
-                "branchNet_reduce_channels": "BN_Rdc",
-                "branchNet_heads": "BN_H",
-                "branchNet_attention_dropout": "BN_DP",
-                # Multibranch specifics
-                "multi_branch_heads": "MB_H",
-                "multi_branch_attention_dropout": "MB_DP",
-                "use_conv_reduction_block": "MB_ConvRed",
-                "conv_reduction_first_kernel_size": "ConvRed_1st",
-                "conv_reduction_second_kernel_size": "ConvRed_2nd",
-                "conv_reduction_third_kernel_size": "ConvRed_3rd"
-            },
-            metric_columns=["loss", "val_loss",
-                            "val_macro_sk_f1",
-                            "val_weighted_sk_f1",
-                            "training_iteration"])
-
-    # The number of GPUs to use depends on the architecture
-    match main_config["arch"]["type"]:
-        case "BaselineModelWithMHAttention":
-            # Six trials in parallel
-            num_gpu = 0.16
-        case "FinalModel":
-            # Five trials in parallel
-            num_gpu = 0.2
-        case "FinalModelMultiBranch":
-            # Two trials in parallel
-            num_gpu = 0.5
-        case "BaselineModelWithSkipConnectionsV2" | "BaselineModelWithSkipConnectionsAndNormV2" | \
-             "BaselineModelWithSkipConnectionsAndNormPreActivation":
-            # One trial at a time
-            num_gpu = 1
-        case _:
-            # Default: Four trials in parallel
-            num_gpu = 0.25
+    # The reporter is used to print the results of the tuning to the console; the displayed
+    # hyperparameter columns per arch are configured in _REPORTER_PARAM_COLUMNS above
+    arch_type = main_config["arch"]["type"]
+    reporter = CLIReporter(parameter_columns=_REPORTER_PARAM_COLUMNS.get(arch_type, None),
+                           metric_columns=_TUNE_METRIC_COLUMNS)
+
+    # The number of GPUs to use depends on the architecture (default: four trials in parallel)
+    num_gpu = _NUM_GPU_BY_ARCH.get(arch_type, 0.25)
+
+    # Size the DataLoader worker pool to the share of the node this trial actually gets: with
+    # 1/num_gpu trials packed onto each GPU, a static num_workers from the JSON config either
+    # oversubscribes the cores (workers thrash) or starves the GPU (workers too few)
+    per_trial_workers = max(2, int(os.cpu_count() * num_gpu))
+
+    # Optional ASHA early stopping: kills trials whose trajectory is dominated instead of training
+    # every grid point to the full epoch budget. Off by default so full-grid comparisons (every
+    # config trained to the end) stay possible; ECGTrainer reports to tune after every epoch,
+    # which is all the scheduler needs.
+    if main_config['trainer'].get('use_asha', False):
+        from ray.tune.schedulers import ASHAScheduler
+        epochs = trainer['epochs']
+        scheduler = ASHAScheduler(max_t=epochs,
+                                  grace_period=max(3, epochs // 10),
+                                  reduction_factor=3)
+    else:
+        scheduler = None
 
     analysis = tune.run(
         run_or_experiment=train_fn,
@@ -257,15 +380,25 @@ def hyper_study(main_config, tune_config, num_tune_samples=1):
             sync_on_checkpoint=False,
             sync_period=60,
         ),
+        # Keep only the two best checkpoints per trial on disk instead of one per epoch; with six
+        # parallel trials the unbounded variant dominates disk throughput on the driver node
+        keep_checkpoints_num=2,
+        checkpoint_score_attr=f"min-{mnt_metric}" if mnt_mode == "min" else mnt_metric,
 
         metric=mnt_metric,
         mode=mnt_mode,
 
-
+        scheduler=scheduler,
         search_alg=BasicVariantGenerator(),
         config={**tune_config},
-        resources_per_trial={"cpu": 5 if torch.cuda.is_available() else 1,
-                             "gpu": num_gpu if torch.cuda.is_available() else 0},
+        # One bundle for the trainable and one CPU bundle matching its DataLoader worker pool,
+        # PACKed so the workers land on the same node as the trainable; deriving the CPU budget
+        # from per_trial_workers instead of a hard-coded count keeps the cores from idling when
+        # fewer workers are needed (and from being oversubscribed when more are)
+        resources_per_trial=tune.PlacementGroupFactory(
+            [{"CPU": 1, "GPU": num_gpu if torch.cuda.is_available() else 0},
+             {"CPU": per_trial_workers}],
+            strategy="PACK"),
 
         max_failures=2,  # retry when error, e.g. OutOfMemory, default is 0
         raise_on_failed_trial=False,  # Failed trials are expected due to assertion errors
@@ -316,36 +449,25 @@ def train_model(config, tune_config=None, train_dl=None, valid_dl=None, checkpoi
     if use_tune:
         # When using Ray Tune, this is distributed among worker processes, which requires seeding within the function
         # Otherwise the same config may to different results -> not reproducible
+        # (the one-time deterministic/env setup already ran in _tune_worker_init for this worker)
         np.random.seed(global_config.SEED)
         torch.manual_seed(global_config.SEED)
         random.seed(global_config.SEED)
         torch.cuda.manual_seed_all(global_config.SEED)
-        os.environ["CUDA_LAUNCH_BLOCKING"] = "1"
-        os.environ["CUBLAS_WORKSPACE_CONFIG"] = ":16:8"
-        # Since entmax is used, warn only needs to be set to True!
-        torch.use_deterministic_algorithms(True, warn_only=True)
-        torch.backends.cudnn.deterministic = True
-        torch.backends.cudnn.benchmark = False
 
         os.environ["CUDA_VISIBLE_DEVICES"] = global_config.CUDA_VISIBLE_DEVICES
+    else:
+        # Explicitly pick the cuDNN mode according to the trainer config instead of inheriting
+        # whatever the entry script set up (train_with_cv.py, for instance, seeds with the fully
+        # deterministic default): with trainer.deterministic=false, cuDNN benchmarks once and then
+        # reuses its fastest algorithms for the fixed-shape convs
+        _apply_determinism(config['trainer'].get('deterministic', True))
 
-    # Conditional inputs depending on the config
-    if config['arch']['type'] == 'BaselineModel':
-        import model.baseline_model as module_arch
-    elif config['arch']['type'] == 'BaselineModelWithMHAttention':
-        import model.baseline_model_with_MHAttention as module_arch
-    elif config['arch']['type'] == 'BaselineModelWithSkipConnectionsAndNormPreActivation':
-        import model.baseline_model_with_skips_and_norm_pre_activation_design as module_arch
-    elif config['arch']['type'] == 'FinalModel':
-        import model.final_model as module_arch
-    elif config['arch']['type'] == 'FinalModelMultiBranch':
-        import model.final_model_multibranch as module_arch
+    # Conditional inputs depending on the config, resolved via the module registries
+    module_arch = importlib.import_module(_ARCH_MODULES[config['arch']['type']])
 
-    if config['arch']['args']['multi_label_training']:
-        import evaluation.multi_label_metrics as module_metric
-    else:
-        # raise NotImplementedError("Single label metrics haven't been checked after the Python update! Do not use them!")
-        import evaluation.single_label_metrics as module_metric
+    # Attention: Single label metrics haven't been checked after the Python update! Better not use them!
+    module_metric = importlib.import_module(_METRIC_MODULES[config['arch']['args']['multi_label_training']])
 
     if use_tune:
         # Adapt the save path for the logging since it differs from trial to trial
@@ -368,12 +490,20 @@ def train_model(config, tune_config=None, train_dl=None, valid_dl=None, checkpoi
         valid_data_loader = valid_dl
     elif cv_active:
         # Setup data_loader instances for current the cross validation run
+        # Pin the host batches so the trainer's non-blocking H2D copies can overlap with the compute;
+        # parallelize the per-sample preprocessing across up to eight workers and keep the pool alive
+        # across epochs instead of paying the worker spin-up each epoch (the default prefetch of two
+        # batches per worker is already sufficient here)
         data_loader = config.init_obj('data_loader', module_data_loader,
                                       cross_valid=True, train_idx=train_idx, valid_idx=valid_idx, cv_train_mode=True,
-                                      fold_id=k_fold, total_num_folds=total_num_folds)
+                                      fold_id=k_fold, total_num_folds=total_num_folds,
+                                      num_workers=min(os.cpu_count(), 8), persistent_workers=True,
+                                      pin_memory=torch.cuda.is_available())
         valid_data_loader = data_loader.split_validation()
     else:
-        data_loader = config.init_obj('data_loader', module_data_loader)
+        data_loader = config.init_obj('data_loader', module_data_loader,
+                                      num_workers=min(os.cpu_count(), 8), persistent_workers=True,
+                                      pin_memory=torch.cuda.is_available())
         valid_data_loader = data_loader.split_validation()
 
     # build model architecture, then print to console
@@ -381,7 +511,12 @@ def train_model(config, tune_config=None, train_dl=None, valid_dl=None, checkpoi
         model = config.init_obj('arch', module_arch)
     else:
         model = config.init_obj('arch', module_arch, **tune_config)
-    logger.info(model)
+    if not use_tune:
+        logger.info(model)
+    else:
+        # Stringifying the full module tree per trial floods Ray's log redirection; the arch name
+        # and parameter count are enough to identify what the trial runs
+        logger.info(f"{type(model).__name__} with {sum(p.numel() for p in model.parameters())} parameters")
 
     if config.config.get("resume", None) is not None:
         # Load the model from the checkpoint
@@ -401,6 +536,16 @@ def train_model(config, tune_config=None, train_dl=None, valid_dl=None, checkpoi
     if len(device_ids) > 1:
         model = torch.nn.DataParallel(model, device_ids=device_ids)
 
+    if config['trainer'].get('compile_model', False) and torch.cuda.is_available() and not use_tune:
+        # Fuses the elementwise chains of the conv/GRU/attention stacks and cuts kernel-launch
+        # overhead via CUDA graphs; opt-in since the generated kernels are not deterministic
+        # (pair with trainer.deterministic=false) and the first steps pay the compile time.
+        # 'reduce-overhead' suits the small-batch ECG models, 'max-autotune' can be selected via
+        # the config instead. Disabled under tune: the short trials rarely amortize the compile
+        # time and the deterministic trial setup interacts badly with the autotuner
+        model = torch.compile(model, mode=config['trainer'].get('compile_mode', 'reduce-overhead'),
+                              fullgraph=False)
+
     # Get function handles of loss and metrics
     # Important: The method config['loss'] must exist in the loss module (<module 'loss.loss' >)
     # Equivalently, all metrics specified in the context must exist in the metrics modul
@@ -417,7 +562,9 @@ def train_model(config, tune_config=None, train_dl=None, valid_dl=None, checkpoi
                                     config['metrics']['sl']['per_epoch_class_wise']]
 
     # build optimizer, learning rate scheduler. delete every lines containing lr_scheduler for disabling scheduler
-    trainable_params = filter(lambda p: p.requires_grad, model.parameters())
+    # Materialize the list instead of a one-shot filter generator, so later consumers can reuse it
+    # without re-walking the module tree
+    trainable_params = [p for p in model.parameters() if p.requires_grad]
     optimizer = config.init_obj('optimizer', torch.optim, trainable_params)
     if config['lr_scheduler']['active']:
         lr_scheduler = config.init_obj('lr_scheduler', torch.optim.lr_scheduler, optimizer)
@@ -470,7 +617,7 @@ if __name__ == '__main__':
 
     # fix random seeds for reproducibility
     global_config.SEED = config.config.get("SEED", global_config.SEED)
-    _set_seed(global_config.SEED)
+    _set_seed(global_config.SEED, deterministic=config['trainer'].get('deterministic', True))
 
     if config.use_tune:
         tuning_params = tuning_params(name=config["arch"]["type"])
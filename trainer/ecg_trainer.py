@@ -47,11 +47,26 @@ class ECGTrainer(BaseTrainer):
         self.do_validation = self.valid_data_loader is not None
         self.lr_scheduler = lr_scheduler
 
+        # Mixed-precision training (opt-in via the trainer config): the forward pass and the loss are run
+        # under autocast and the loss is scaled before backward to avoid underflow in the half-precision
+        # gradients. Only effective on CUDA; with AMP disabled, the GradScaler degenerates to plain backward/step
+        self._use_amp = config['trainer'].get('use_amp', False) and self.device.type == 'cuda'
+        self.scaler = torch.cuda.amp.GradScaler(enabled=self._use_amp)
+
         self.batch_log_step = int(
             512 / self.data_loader.batch_size)  # used for logging frequency during the training loop
         self.epoch_log_step_train = 25  # used for epoch metrics and confusion matrix handling
         self.epoch_log_step_valid = 15  # Usually used for confusion matrix handling, at the moment disabled
 
+        # Cache the components of the _progress debug string once; the loader attributes do not
+        # change during training, so there is no need to re-read them on every logged batch
+        if hasattr(self.data_loader, 'n_samples'):
+            self._progress_batch_size = self.data_loader.batch_size
+            self._progress_total = self.data_loader.n_samples
+        else:
+            self._progress_batch_size = None
+            self._progress_total = self.len_epoch
+
         self._class_labels = self.data_loader.dataset.class_labels
 
         # metrics
@@ -100,6 +115,19 @@ class ECGTrainer(BaseTrainer):
             "clip": config["loss"]["add_args"].get("clip", 0.05),
         }
 
+        # Resolve each metric's name and its static additional kwargs once: the __name__ lookups,
+        # the config subscriptions and (for the epoch-based metrics) the inspect.signature walks
+        # do not change during training, so there is no need to repeat them on every metric call
+        metric_cfg = config['metrics']['ml' if self.multi_label_training else 'sl']
+        self._metrics_iter_prepared = [
+            (met.__name__, met,
+             {param_name: self._param_dict[param_name] for param_name in metric_cfg['per_iteration'][met.__name__]})
+            for met in self.metrics_iter]
+        self._metrics_epoch_prepared = [(met.__name__, met, self._kwargs_from_signature(met))
+                                        for met in self.metrics_epoch]
+        self._metrics_epoch_class_wise_prepared = [(met.__name__, met, self._kwargs_from_signature(met))
+                                                   for met in self.metrics_epoch_class_wise]
+
         # confusion matrices
         self.train_cms = ConfusionMatrixTracker(*self.data_loader.dataset.class_labels,
                                                 writer=self.writer, multi_label_training=self.multi_label_training)
@@ -119,11 +147,11 @@ class ECGTrainer(BaseTrainer):
         self.train_metrics.reset()
         self.train_cms.reset()
 
-        if epoch == 1 or epoch % self.epoch_log_step_train == 0:
-            # If there are epoch-based metrics, store the intermediate targets and the output scores
-            outputs_list = []
-            targets_list = []
-            targets_all_labels_list = [] if not self.multi_label_training else None
+        # Store the intermediate targets and output scores of all batches; the per-iteration metrics
+        # (and, each epoch_log_step, the epoch-based ones) are computed on them once at the epoch end
+        outputs_list = []
+        targets_list = []
+        targets_all_labels_list = [] if not self.multi_label_training else None
 
         # Set the writer object to training mode
         if self.writer is not None:
@@ -154,78 +182,79 @@ class ECGTrainer(BaseTrainer):
                     self.data_loader):
 
                 if self.multi_label_training:
-                    data, target = padded_records.to(self.device), labels_one_hot.to(self.device)
+                    data, target = padded_records.to(self.device, non_blocking=True), \
+                        labels_one_hot.to(self.device, non_blocking=True)
                 else:
                     # target contains the first GT label, target_all_labels contains all labels in 1-hot-encoding
-                    data, target, target_all_labels = padded_records.to(self.device), first_labels.to(self.device), \
-                        labels_one_hot.to(self.device)
-                data = data.permute(0, 2, 1)  # switch seq_len and feature_size (12 = #leads)
-
-                self.optimizer.zero_grad()
-                # data has shape [batch_size, 12, seq_len]
-                output = self.model(data)
-
-                multi_lead_branch_active = False
-                if type(output) is tuple:
-                    if isinstance(output[1], list):
-                        # multi-branch network
-                        # first element is the overall network output, the second one a list of the single lead branches
-                        multi_lead_branch_active = True
-                        output, single_lead_outputs = output
-                        # detached_single_lead_outputs = torch.stack(single_lead_outputs).detach().cpu()
-                    else:
-                        # single-branch network
-                        output, attention_weights = output
-
-                # Detach tensors needed for further tracing and metrics calculation to remove them from the graph
-                detached_output = output.detach().cpu()
-                detached_target = target.detach().cpu()
-                if not self.multi_label_training:
-                    detached_target_all_labels = target_all_labels.detach().cpu()
-
-                if epoch == 1 or epoch % self.epoch_log_step_train == 0:
+                    data, target, target_all_labels = padded_records.to(self.device, non_blocking=True), \
+                        first_labels.to(self.device, non_blocking=True), \
+                        labels_one_hot.to(self.device, non_blocking=True)
+
+                # Free the gradients instead of zeroing them; the next backward allocates fresh buffers,
+                # which skips one full-parameter-size memset kernel per step
+                self.optimizer.zero_grad(set_to_none=True)
+                with torch.cuda.amp.autocast(enabled=self._use_amp):
+                    # data has shape [batch_size, 12, seq_len]
+                    output = self.model(data)
+
+                    multi_lead_branch_active = False
+                    if type(output) is tuple:
+                        if isinstance(output[1], list):
+                            # multi-branch network
+                            # first element is the overall network output,
+                            # the second one a list of the single lead branches
+                            multi_lead_branch_active = True
+                            output, single_lead_outputs = output
+                            # detached_single_lead_outputs = torch.stack(single_lead_outputs).detach().cpu()
+                        else:
+                            # single-branch network
+                            output, attention_weights = output
+
+                    # Detach tensors needed for further tracing and metrics calculation to remove them from
+                    # the graph, but keep them on the device; they are moved to the CPU once at the end of
+                    # the epoch instead of forcing a GPU synchronization on every batch
                     # TODO Maybe also track the single lead outputs here?
-                    outputs_list.append(detached_output)
-                    targets_list.append(detached_target)
+                    outputs_list.append(output.detach())
+                    targets_list.append(target.detach())
                     if not self.multi_label_training:
-                        targets_all_labels_list.append(detached_target_all_labels)
-
-                # Calculate the loss, here gradients are nedded!
-                additional_args = self.config['loss']['add_args']
-                additional_kwargs = {
-                    param_name: self._param_dict[param_name.replace('pos_weights', 'train_pos_weights').
-                    replace('class_weights', 'train_class_weights')] for param_name in additional_args
-                }
-
-                if not multi_lead_branch_active:
-                    loss = self.criterion(target=target, output=output, **additional_kwargs)
-                else:
-                    # Ensure that self.criterion is a function, namely multi_branch_BCE_with_logits
-                    assert callable(self.criterion) and self.criterion.__name__ \
-                           in ["multi_branch_BCE_with_logits", "multi_branch_asymmetric_loss_with_logits"], \
-                        "For the multibranch network, the multibranch BCE with logits loss function has to be used!"
-                    # Calculate the joint loss of each single lead branch and the overall network
-                    loss = self.criterion(target=target, output=output,
-                                          single_lead_outputs = single_lead_outputs,
-                                          **additional_kwargs)
+                        targets_all_labels_list.append(target_all_labels.detach())
 
+                    # Calculate the loss, here gradients are nedded!
+                    additional_args = self.config['loss']['add_args']
+                    additional_kwargs = {
+                        param_name: self._param_dict[param_name.replace('pos_weights', 'train_pos_weights').
+                        replace('class_weights', 'train_class_weights')] for param_name in additional_args
+                    }
 
-                loss.backward()
-
-                self.optimizer.step()
+                    if not multi_lead_branch_active:
+                        loss = self.criterion(target=target, output=output, **additional_kwargs)
+                    else:
+                        # Ensure that self.criterion is a function, namely multi_branch_BCE_with_logits
+                        assert callable(self.criterion) and self.criterion.__name__ \
+                               in ["multi_branch_BCE_with_logits", "multi_branch_asymmetric_loss_with_logits"], \
+                            "For the multibranch network, the multibranch BCE with logits loss function has to be used!"
+                        # Calculate the joint loss of each single lead branch and the overall network
+                        loss = self.criterion(target=target, output=output,
+                                              single_lead_outputs=single_lead_outputs,
+                                              **additional_kwargs)
+
+                # Scaled backward pass; with AMP disabled this is equivalent to loss.backward() + optimizer.step()
+                self.scaler.scale(loss).backward()
+
+                self.scaler.step(self.optimizer)
+                self.scaler.update()
                 if self.writer is not None:
                     self.writer.set_step((epoch - 1) * self.len_epoch + batch_idx)
 
-                # Iteratively update the loss and the metrics with the MetricTracker for each batch
-                # TODO Maybe also track the single lead outputs here?
-                self._do_iter_update(metric_tracker=self.train_metrics, output=detached_output,
-                                     target=detached_target, loss_val=loss.item())
+                # Iteratively update only the loss with the MetricTracker; the other per-iteration metrics
+                # are computed once at the epoch end on the accumulated outputs to keep the sklearn-based
+                # metric computation off the per-batch critical path
+                # loss.item() synchronizes with the GPU, so fetch the value exactly once per batch
+                loss_val = loss.item()
+                self.train_metrics.iter_update('loss', loss_val, n=output.shape[0])
 
                 if batch_idx % self.batch_log_step == 0:
-                    epoch_debug = f"Train Epoch: {epoch} {self._progress(batch_idx)} "
-                    current_metrics = self.train_metrics.current()
-                    metrics_debug = ", ".join(f"{key}: {value:.6f}" for key, value in current_metrics.items())
-                    self.logger.debug(epoch_debug + metrics_debug)
+                    self.logger.debug(f"Train Epoch: {epoch} {self._progress(batch_idx)} loss: {loss_val:.6f}")
 
                 if self.profiler_active:
                     profiler.step()
@@ -233,14 +262,23 @@ class ECGTrainer(BaseTrainer):
                 if batch_idx == self.len_epoch:
                     break
 
+        # Concatenate the accumulated (still device-resident) outputs and targets once per epoch and move
+        # them to the CPU for the metric computation; under AMP the outputs may be half precision
+        det_outputs = torch.cat(outputs_list).float().cpu()
+        det_targets = torch.cat(targets_list).cpu()
+        det_targets_all_labels = torch.cat(targets_all_labels_list).cpu() if not self.multi_label_training else None
+
+        # Compute the per-iteration metrics once on the whole epoch instead of per batch
+        self._do_deferred_iter_update(metric_tracker=self.train_metrics, output=det_outputs, target=det_targets)
+
         # At the end of each epoch, explicitly handle the tracking of metrics and confusion matrices by means of
         # the SummaryWriter/TensorboardWriter, but only each epoch_log_step steps
         if epoch == 1 or epoch % self.epoch_log_step_train == 0:
             # Update the cms and metrics
             # TODO Maybe also track the single lead outputs here?
             summary_str = self._handle_tracking_at_epoch_end(metric_tracker=self.train_metrics, epoch=epoch,
-                                                             outputs=outputs_list, targets=targets_list,
-                                                             targets_all_labels=targets_all_labels_list,
+                                                             det_outputs=det_outputs, det_targets=det_targets,
+                                                             det_targets_all_labels=det_targets_all_labels,
                                                              mode='train', track_cms=False)
         else:
             summary_str = "Not calc."
@@ -310,6 +348,10 @@ class ECGTrainer(BaseTrainer):
         targets_list = []
         targets_all_labels_list = [] if not self.multi_label_training else None
 
+        # Hoist the step-base computation out of the batch loop; len() on a DataLoader goes through
+        # the sampler length on every call
+        step_base = (epoch - 1) * len(self.valid_data_loader)
+
         # Set the writer object to validation mode
         if self.writer is not None:
             self.writer.set_mode('valid')
@@ -320,65 +362,66 @@ class ECGTrainer(BaseTrainer):
             for batch_idx, (padded_records, _, first_labels, labels_one_hot, record_names) in \
                     enumerate(self.valid_data_loader):
                 if self.multi_label_training:
-                    data, target = padded_records.to(self.device), labels_one_hot.to(self.device)
+                    data, target = padded_records.to(self.device, non_blocking=True), \
+                        labels_one_hot.to(self.device, non_blocking=True)
                 else:
                     # target contains the first GT label, target_all_labels contains all labels in 1-hot-encoding
-                    data, target, target_all_labels = padded_records.to(self.device), first_labels.to(self.device), \
-                        labels_one_hot.to(self.device)
+                    data, target, target_all_labels = padded_records.to(self.device, non_blocking=True), \
+                        first_labels.to(self.device, non_blocking=True), \
+                        labels_one_hot.to(self.device, non_blocking=True)
+
+
+                # No GradScaler involved here since no gradients are computed during validation,
+                # autocast alone is sufficient
+                with torch.cuda.amp.autocast(enabled=self._use_amp):
+                    output = self.model(data)
+
+                    multi_lead_branch_active = False
+                    if type(output) is tuple:
+                        if isinstance(output[1], list):
+                            # multi-branch network
+                            # first element is the overall network output,
+                            # the second one a list of the single lead branches
+                            multi_lead_branch_active = True
+                            output, single_lead_outputs = output
+                        # detached_single_lead_outputs = torch.stack(single_lead_outputs).detach().cpu()
+                        else:
+                            # single-branch network
+                            output, attention_weights = output
 
-                data = data.permute(0, 2, 1)  # switch seq_len and feature_size (12 = #leads)
+                    # Detach tensors needed for further tracing and metrics calculation to remove them from
+                    # the graph, but keep them on the device; they are moved to the CPU once at the end of
+                    # the epoch instead of forcing a GPU synchronization on every batch
+                    # TODO Maybe also track the single lead outputs here?
+                    outputs_list.append(output.detach())
+                    targets_list.append(target.detach())
+                    if not self.multi_label_training:
+                        targets_all_labels_list.append(target_all_labels.detach())
 
-                output = self.model(data)
+                    additional_args = self.config['loss']['add_args']
+                    additional_kwargs = {
+                        param_name: self._param_dict[param_name.replace('pos_weights', 'train_pos_weights').
+                        replace('class_weights', 'train_class_weights')] for param_name in additional_args
+                    }
 
-                multi_lead_branch_active = False
-                if type(output) is tuple:
-                    if isinstance(output[1], list):
-                        # multi-branch network
-                        # first element is the overall network output, the second one a list of the single lead branches
-                        multi_lead_branch_active = True
-                        output, single_lead_outputs = output
-                    # detached_single_lead_outputs = torch.stack(single_lead_outputs).detach().cpu()
+                    if not multi_lead_branch_active:
+                        loss = self.criterion(target=target, output=output, **additional_kwargs)
                     else:
-                        # single-branch network
-                        output, attention_weights = output
-
-                # Detach tensors needed for further tracing and metrics calculation to remove them from the graph
-                detached_output = output.detach().cpu()
-                detached_target = target.detach().cpu()
-                if not self.multi_label_training:
-                    detached_target_all_labels = target_all_labels.detach().cpu()
-
-                # TODO Maybe also track the single lead outputs here?
-                outputs_list.append(detached_output)
-                targets_list.append(detached_target)
-                if not self.multi_label_training:
-                    targets_all_labels_list.append(detached_target_all_labels)
-
-                additional_args = self.config['loss']['add_args']
-                additional_kwargs = {
-                    param_name: self._param_dict[param_name.replace('pos_weights', 'train_pos_weights').
-                    replace('class_weights', 'train_class_weights')] for param_name in additional_args
-                }
-
-                if not multi_lead_branch_active:
-                    loss = self.criterion(target=target, output=output, **additional_kwargs)
-                else:
-                    # Ensure that self.criterion is a function, namely multi_branch_BCE_with_logits
-                    assert callable(self.criterion) and self.criterion.__name__ \
-                           in ["multi_branch_BCE_with_logits", "multi_branch_asymmetric_loss_with_logits"], \
-                        "For the multibranch network, the multibranch BCE with logits loss function has to be used!"
-                    # Calculate the joint loss of each single lead branch and the overall network
-                    loss = self.criterion(target=target, output=output,
-                                          single_lead_outputs=single_lead_outputs,
-                                          **additional_kwargs)
+                        # Ensure that self.criterion is a function, namely multi_branch_BCE_with_logits
+                        assert callable(self.criterion) and self.criterion.__name__ \
+                               in ["multi_branch_BCE_with_logits", "multi_branch_asymmetric_loss_with_logits"], \
+                            "For the multibranch network, the multibranch BCE with logits loss function has to be used!"
+                        # Calculate the joint loss of each single lead branch and the overall network
+                        loss = self.criterion(target=target, output=output,
+                                              single_lead_outputs=single_lead_outputs,
+                                              **additional_kwargs)
 
                 if self.writer is not None:
-                    self.writer.set_step((epoch - 1) * len(self.valid_data_loader) + batch_idx)
+                    self.writer.set_step(step_base + batch_idx)
 
-                # Iteratively update the loss and the metrics with the MetricTracker
-                # TODO Maybe also track the single lead outputs here?
-                self._do_iter_update(metric_tracker=self.valid_metrics, output=detached_output,
-                                     target=detached_target, loss_val=loss.item())
+                # Iteratively update only the loss with the MetricTracker; the other per-iteration metrics
+                # are computed once at the epoch end on the accumulated outputs
+                self.valid_metrics.iter_update('loss', loss.item(), n=output.shape[0])
 
                 # if batch_idx % self.batch_log_step == 0:
                 #     epoch_debug = f"Valid Epoch: {epoch} {self._progress(batch_idx, valid=True)} "
@@ -386,15 +429,24 @@ class ECGTrainer(BaseTrainer):
                 #     metrics_debug = ", ".join(f"{key}: {value:.6f}" for key, value in current_metrics.items())
                 #     self.logger.debug(epoch_debug + metrics_debug)
 
+        # Concatenate the accumulated (still device-resident) outputs and targets once per epoch and move
+        # them to the CPU for the metric computation; under AMP the outputs may be half precision
+        det_outputs = torch.cat(outputs_list).float().cpu()
+        det_targets = torch.cat(targets_list).cpu()
+        det_targets_all_labels = torch.cat(targets_all_labels_list).cpu() if not self.multi_label_training else None
+
+        # Compute the per-iteration metrics once on the whole epoch instead of per batch
+        self._do_deferred_iter_update(metric_tracker=self.valid_metrics, output=det_outputs, target=det_targets)
+
         # At the end of each epoch, explicitly handle the tracking of confusion matrices and metrics by means of
         # the SummaryWriter/TensorboardWriter
         # For validation, metrics are calculated each epoch
         # Do not calculate and track the confusion matrices each time, ony each few epochs
         # TODO Maybe also track the single lead outputs here?
         valid_sum_str = self._handle_tracking_at_epoch_end(metric_tracker=self.valid_metrics, epoch=epoch,
-                                                           outputs=outputs_list, targets=targets_list,
-                                                           targets_all_labels=targets_all_labels_list, mode='valid',
-                                                           track_cms=False)
+                                                           det_outputs=det_outputs, det_targets=det_targets,
+                                                           det_targets_all_labels=det_targets_all_labels,
+                                                           mode='valid', track_cms=False)
 
 
         # For validation, the metrics are contained each epoch
@@ -415,30 +467,24 @@ class ECGTrainer(BaseTrainer):
 
         return valid_log, valid_sum_str
 
-    def _do_iter_update(self, metric_tracker, output, target, loss_val):
-        # Iteratively update the loss and the metrics with the MetricTracker
-        # To this end, the Tracker internally maintains a dataframe containing different columns:
-        # columns=['current', 'sum', 'square_sum','counts', 'mean', 'square_avg', 'std']
-        # The loss and each metric are updated in a separate row for each of them
-        metric_tracker.iter_update('loss', loss_val, n=output.shape[0])
-        for met in self.metrics_iter:
-            if self.multi_label_training:
-                additional_args = self.config['metrics']['ml']['per_iteration'][met.__name__]
-            else:
-                additional_args = self.config['metrics']['sl']['per_iteration'][met.__name__]
-            additional_kwargs = {
-                param_name: self._param_dict[param_name] for param_name in additional_args
-            }
-            metric_tracker.iter_update(met.__name__, met(target=target, output=output, **additional_kwargs),
+    def _kwargs_from_signature(self, met):
+        args = inspect.signature(met).parameters.values()
+        # Output and target are needed for all metrics! Only consider other args WITHOUT default
+        additional_args = [arg.name for arg in args
+                           if arg.name not in ('output', 'target') and arg.default is arg.empty]
+        return {param_name: self._param_dict[param_name] for param_name in additional_args}
+
+    def _do_deferred_iter_update(self, metric_tracker, output, target):
+        # Update the per-iteration metrics with the MetricTracker once per epoch on the concatenated
+        # outputs and targets; the loss is already tracked batch-wise in the epoch loops
+        # Computing these metrics per batch would synchronize with the GPU on every step
+        for name, met, additional_kwargs in self._metrics_iter_prepared:
+            metric_tracker.iter_update(name, met(target=target, output=output, **additional_kwargs),
                                        n=output.shape[0])
 
-    def _handle_tracking_at_epoch_end(self, metric_tracker, epoch, outputs, targets,
-                                      targets_all_labels, mode, track_cms):
-        # Get detached tensors from the list for further evaluation
-        # For this, create a tensor from the dynamically filled list
-        det_outputs = torch.cat(outputs).detach().cpu()
-        det_targets = torch.cat(targets).detach().cpu()
-        det_targets_all_labels = torch.cat(targets_all_labels).detach().cpu() if not self.multi_label_training else None
+    def _handle_tracking_at_epoch_end(self, metric_tracker, epoch, det_outputs, det_targets,
+                                      det_targets_all_labels, mode, track_cms):
+        # The epoch loops already concatenated the accumulated batch tensors and moved them to the CPU
 
         # ------------ Confusion matrices ------------------------
         if track_cms:
@@ -450,28 +496,14 @@ class ECGTrainer(BaseTrainer):
         # ------------ Metrics ------------------------------------
         # Finally, the epoch-based metrics need to be updated
         # For this, calculate both, the normal epoch-based metrics as well as the class-wise epoch-based metrics
-        for met in self.metrics_epoch:
-            args = inspect.signature(met).parameters.values()
-            # Output and target are needed for all metrics! Only consider other args WITHOUT default
-            additional_args = [arg.name for arg in args
-                               if arg.name not in ('output', 'target') and arg.default is arg.empty]
-            additional_kwargs = {
-                param_name: self._param_dict[param_name] for param_name in additional_args
-            }
-            metric_tracker.epoch_update(met.__name__, met(target=det_targets, output=det_outputs,
-                                                              **additional_kwargs))
+        # (names and additional kwargs were resolved once in __init__)
+        for name, met, additional_kwargs in self._metrics_epoch_prepared:
+            metric_tracker.epoch_update(name, met(target=det_targets, output=det_outputs, **additional_kwargs))
 
         # This holds for the class-wise, epoch-based metrics as well
-        for met in self.metrics_epoch_class_wise:
-            args = inspect.signature(met).parameters.values()
-            # Output and target are needed for all metrics! Only consider other args WITHOUT default
-            additional_args = [arg.name for arg in args
-                               if arg.name not in ('output', 'target') and arg.default is arg.empty]
-            additional_kwargs = {
-                param_name: self._param_dict[param_name] for param_name in additional_args
-            }
-            metric_tracker.class_wise_epoch_update(met.__name__, met(target=det_targets, output=det_outputs,
-                                                                     **additional_kwargs))
+        for name, met, additional_kwargs in self._metrics_epoch_class_wise_prepared:
+            metric_tracker.class_wise_epoch_update(name, met(target=det_targets, output=det_outputs,
+                                                             **additional_kwargs))
 
         # ------------------- Predicted Scores and Classes -------------------
         # Create a summary for each call, dump the dict and return the string
@@ -545,12 +577,9 @@ class ECGTrainer(BaseTrainer):
 
 
     def _progress(self, batch_idx):
-        base = '[{}/{} ({:.0f}%)]'
-        data_loader = self.data_loader  # if not valid else self.valid_data_loader
-        if hasattr(data_loader, 'n_samples'):
-            current = batch_idx * data_loader.batch_size
-            total = data_loader.n_samples
+        if self._progress_batch_size is not None:
+            current = batch_idx * self._progress_batch_size
         else:
             current = batch_idx
-            total = self.len_epoch
-        return base.format(current, total, 100.0 * current / total)
+        total = self._progress_total
+        return '[{}/{} ({:.0f}%)]'.format(current, total, 100.0 * current / total)
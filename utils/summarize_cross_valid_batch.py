@@ -44,48 +44,27 @@ def summarize_single_cross_valid(cv_path):
     df_single_metrics = df_single_metrics.round(3)
 
     # Create a table with class-wise F1 per Fold, the avg metrics, the subset accuracy and the mean values
+    # One cross-section per metric replaces the former per-fold MultiIndex .loc lookups (>13 per fold)
+    folds = ['fold_' + str(fold) for fold in range(1, 11)]
+    f1_scores = df_class_wise.xs('f1-score', level=1).loc[folds]
+    roc_scores = df_class_wise.xs('torch_roc_auc', level=1).loc[folds]
+    acc_scores = df_class_wise.xs('torch_accuracy', level=1).loc[folds]
+
+    df_results = pd.DataFrame({'Fold': range(1, 11)}, index=folds)
+    # Class-wise F1 (the first nine columns are the class scores, the remaining ones the averages)
+    df_results[['SNR', 'AF', 'IAVB', 'LBBB', 'RBBB', 'PAC', 'VEB', 'STD', 'STE']] = f1_scores.iloc[:, 0:9].to_numpy()
     if include_weighted_avg:
-        df_results = pd.DataFrame(columns=['Fold', 'SNR', 'AF', 'IAVB', 'LBBB', 'RBBB', 'PAC', 'VEB', 'STD', 'STE',
-                                           'W-AVG_F1', 'W-AVG_ROC', 'W-AVG_Acc', 'm-AVG_F1', 'm-AVG_ROC', 'm-AVG_Acc',
-                                           'MR'])
+        df_results['W-AVG_F1'] = f1_scores['weighted avg'].to_numpy()
+        df_results['W-AVG_ROC'] = roc_scores['weighted avg'].to_numpy()
+        df_results['W-AVG_Acc'] = acc_scores['weighted avg'].to_numpy()
     elif include_at_least_weighted_F1:
-        df_results = pd.DataFrame(columns=['Fold', 'SNR', 'AF', 'IAVB', 'LBBB', 'RBBB', 'PAC', 'VEB', 'STD', 'STE',
-                                           'W-AVG_F1', 'm-AVG_F1', 'm-AVG_ROC', 'm-AVG_Acc', 'MR'])
-    else:
-        df_results = pd.DataFrame(columns=['Fold', 'SNR', 'AF', 'IAVB', 'LBBB', 'RBBB', 'PAC', 'VEB', 'STD', 'STE',
-                                           'm-AVG_F1', 'm-AVG_ROC', 'm-AVG_Acc', 'MR'])
-    for fold in range(1, 11):
-        row_values = []
-
-        # Append the fold id
-        row_values.append(fold)
-
-        # Append F1 metrics (class-wise)
-        f1_metrics = df_class_wise.loc[('fold_' + str(fold), 'f1-score')].iloc[0:9].values.tolist()
-        row_values = row_values + f1_metrics
-
-        if include_weighted_avg:
-            # Append the weighted AVG for F1
-            row_values.append(df_class_wise.loc[('fold_' + str(fold), 'f1-score')]['weighted avg'])
-            # Append the weighted AVG for ROC-AUC
-            row_values.append(df_class_wise.loc[('fold_' + str(fold), 'torch_roc_auc')]['weighted avg'])
-            # Append the weighted AVG for Acc
-            row_values.append(df_class_wise.loc[('fold_' + str(fold), 'torch_accuracy')]['weighted avg'])
-        elif include_at_least_weighted_F1:
-            # Append the weighted AVG for F1
-            row_values.append(df_class_wise.loc[('fold_' + str(fold), 'f1-score')]['weighted avg'])
-
-        # Append the macro AVG for F1
-        row_values.append(df_class_wise.loc[('fold_' + str(fold), 'f1-score')]['macro avg'])
-        # Append the macro ROC-AUC
-        row_values.append(df_class_wise.loc[('fold_' + str(fold), 'torch_roc_auc')]['macro avg'])
-        # Append the macro for Acc
-        row_values.append(df_class_wise.loc[('fold_' + str(fold), 'torch_accuracy')]['macro avg'])
-        # Append the subset acc (=MR)
-        row_values.append(df_single_metrics.loc['fold_' + str(fold)]['sk_subset_accuracy'])
-
-        # Add the row to the summary dataframe
-        df_results.loc[len(df_results)] = row_values
+        df_results['W-AVG_F1'] = f1_scores['weighted avg'].to_numpy()
+    df_results['m-AVG_F1'] = f1_scores['macro avg'].to_numpy()
+    df_results['m-AVG_ROC'] = roc_scores['macro avg'].to_numpy()
+    df_results['m-AVG_Acc'] = acc_scores['macro avg'].to_numpy()
+    # Subset accuracy (=MR)
+    df_results['MR'] = df_single_metrics.loc[folds, 'sk_subset_accuracy'].to_numpy()
+    df_results = df_results.reset_index(drop=True)
 
     df_results["Fold"] = pd.to_numeric(df_results["Fold"], downcast='integer')
     # Append another row containing the mean
@@ -1,5 +1,4 @@
 import os.path
-from math import sqrt
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -17,10 +16,15 @@ class MetricTracker:
 
     def __init__(self, keys_iter: list, keys_epoch: list, keys_epoch_class_wise: list, labels: list, writer=None):
         self.writer = writer
-        # Create a dataframe containing one row per key (e.g. one per metric and another one for the loss)
-        self._data_iter = pd.DataFrame(index=keys_iter,
-                                       columns=['current', 'sum', 'square_sum', 'counts', 'mean', 'square_avg', 'std'],
-                                       dtype=np.float64)
+        # The per-iteration statistics are accumulated in flat numpy arrays with one slot per key
+        # (e.g. one per metric and another one for the loss); the per-batch .at lookups on a dataframe
+        # dominated the tracking cost, so a dataframe view is only materialized once per epoch in result()
+        self._keys_iter = list(keys_iter)
+        self._iter_idx = {key: idx for idx, key in enumerate(self._keys_iter)}
+        self._current = np.zeros(len(self._keys_iter), dtype=np.float64)
+        self._sum = np.zeros(len(self._keys_iter), dtype=np.float64)
+        self._square_sum = np.zeros(len(self._keys_iter), dtype=np.float64)
+        self._counts = np.zeros(len(self._keys_iter), dtype=np.float64)
         all_keys_epoch_class_wise = [keys_epoch_class_wise[idx_ftn] + '_class_' + str(labels[idx_class])
                                      for idx_class in range(0, len(labels))
                                      for idx_ftn in range(0, len(keys_epoch_class_wise))]
@@ -43,16 +47,17 @@ class MetricTracker:
         self._epoch = value
 
     def reset(self):
-        for col in self._data_iter.columns:
-            self._data_iter[col].values[:] = 0
+        for array in (self._current, self._sum, self._square_sum, self._counts):
+            array[:] = 0
 
     def iter_update(self, key, value, n=1):
         if self.writer is not None:
             self.writer.add_scalar(key, value)
-        self._data_iter.at[key, 'current'] = value
-        self._data_iter.at[key, 'sum'] += value * n
-        self._data_iter.at[key, 'square_sum'] += value * value * n
-        self._data_iter.at[key, 'counts'] += n
+        idx = self._iter_idx[key]
+        self._current[idx] = value
+        self._sum[idx] += value * n
+        self._square_sum[idx] += value * value * n
+        self._counts[idx] += n
 
     def epoch_update(self, key, value):
         if self.writer is not None:
@@ -68,25 +73,18 @@ class MetricTracker:
             self._data_epoch.at[full_key_name, 'mean'] = values[idx_class].item()
 
     def current(self):
-        return dict(self._data_iter['current'])
-
-    def avg(self):
-        for key, row in self._data_iter.iterrows():
-            self._data_iter.at[key, 'mean'] = row['sum'] / row['counts']
-            self._data_iter.at[key, 'square_avg'] = row['square_sum'] / row['counts']
-
-    def std(self):
-        for key, row in self._data_iter.iterrows():
-            self._data_iter.at[key, 'std'] = sqrt(row['square_avg'] - row['mean'] ** 2 + smooth)
+        return dict(zip(self._keys_iter, self._current))
 
     def result(self, include_epoch_metrics):
-        self.avg()
-        self.std()
-        iter_result = self._data_iter[['mean', 'std']]
+        # Derive mean and std for all keys at once from the accumulated sums
+        mean = self._sum / self._counts
+        square_avg = self._square_sum / self._counts
+        std = np.sqrt(square_avg - mean ** 2 + smooth)
+        iter_result = pd.DataFrame({'mean': mean, 'std': std}, index=self._keys_iter)
         # Send the mean epoch values for the iteration metrics to the tensorboard writer as well
         if self.writer is not None:
-            for key, row in iter_result.iterrows():
-                self.writer.add_scalar('epoch_' + key, iter_result.at[key, 'mean'], global_step=self._epoch)
+            for key, key_mean in zip(self._keys_iter, mean):
+                self.writer.add_scalar('epoch_' + key, key_mean, global_step=self._epoch)
         return pd.concat([iter_result, self._data_epoch]) if include_epoch_metrics else iter_result
 
 